@@ -0,0 +1,378 @@
+'''
+Performance benchmarks for the site generator
+
+Run from the project root (or use bench.sh), e.g.:
+    python3 src/benchmark.py suite --pages 200 --blocks 50 --name baseline
+    python3 src/benchmark.py compare .cache/bench/baseline.json .cache/bench/after.json
+    python3 src/benchmark.py walk --files 100000
+    python3 src/benchmark.py memory --blocks 20000
+'''
+import argparse, json, os, platform, random, shutil, subprocess, sys, tempfile, time, timeit, tracemalloc, resource
+from walk import walk_files
+from main import copy_contents, rm_r
+from htmlnode import ParentNode
+from config import PROJECT, CACHE, TEMPLATE
+from splitter_funcs import text_to_text_nodes
+import split_block
+
+# How often each kind of block appears in a generated document, relative to the others
+DEFAULT_MIX = {"heading": 1, "paragraph": 4, "unordered_list": 1, "ordered_list": 1, "quote": 1, "code": 1}
+
+# Words used to fill generated text
+WORDS = "the quick brown fox jumps over lazy dog elves hobbits rings mountains rivers forests wizards".split()
+
+
+def timed(func, *args):
+    '''
+    Calls a function and measures how long it took
+
+    Outputs:
+        A (result, seconds) tuple
+    '''
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_walk(files: int) -> dict:
+    '''
+    Times walking, copying and deleting a single folder holding a large number of files
+
+    Inputs:
+        files: The number of files to put in the folder
+
+    Outputs:
+        A dict of timings in seconds
+    '''
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "src", "flat")
+        os.makedirs(src)
+        for i in range(files):
+            open(os.path.join(src, f"{i}.txt"), "w").close()
+        dest = os.path.join(tmp, "dest")
+
+        count, walk_time = timed(lambda: sum(1 for _ in walk_files(src)))
+        assert count == files
+        _, copy_time = timed(copy_contents, os.path.dirname(src), dest)
+        _, rm_time = timed(rm_r, dest)
+        assert not os.path.exists(dest)
+    return {"files": files, "walk": walk_time, "copy_contents": copy_time, "rm_r": rm_time}
+
+
+def inline_text(rng: random.Random, words: int, inline: float) -> str:
+    '''
+    Makes a line of text with links, images and emphasis sprinkled through it
+
+    Inputs:
+        rng: The random number generator to draw from
+        words: How many words the line has
+        inline: The chance of each word being an inline element
+
+    Outputs:
+        A string of markdown
+    '''
+    out = []
+    for _ in range(words):
+        word = rng.choice(WORDS)
+        if rng.random() < inline:
+            word = rng.choice([
+                f"**{word}**",
+                f"_{word}_",
+                f"`{word}`",
+                f"[{word}](/{word}/{rng.randrange(1000)})",
+                f"![{word}](/images/{word}.png)",
+            ])
+        out.append(word)
+    return " ".join(out)
+
+
+def synthetic_markdown(blocks: int, mix=None, inline=0.2, seed=0) -> str:
+    '''
+    Builds a markdown document with a given mix of block kinds
+
+    Inputs:
+        blocks: The number of blocks in the document (after the title)
+        mix: A dict of block kinds (see DEFAULT_MIX) to relative weights
+        inline: The chance of each word being an inline element (link, image, bold, italic or code)
+        seed: Seeds the random choices so the same arguments always make the same document
+
+    Outputs:
+        A string of markdown
+    '''
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds = list(mix)
+    weights = [mix[i] for i in kinds]
+    out = [f"# {inline_text(rng, 4, 0)}"]
+    for kind in rng.choices(kinds, weights, k=blocks):
+        lines = rng.randint(1, 5)
+        match kind:
+            case "heading":
+                out.append("#" * rng.randint(2, 6) + " " + inline_text(rng, 5, inline))
+            case "paragraph":
+                out.append("\n".join(inline_text(rng, 12, inline) for _ in range(lines)))
+            case "unordered_list":
+                out.append("\n".join("- " + inline_text(rng, 6, inline) for _ in range(lines)))
+            case "ordered_list":
+                out.append("\n".join(f"{i + 1}. " + inline_text(rng, 6, inline) for i in range(lines)))
+            case "quote":
+                out.append("\n".join("> " + inline_text(rng, 8, inline) for _ in range(lines)))
+            case "code":
+                out.append("```\n" + "\n".join(inline_text(rng, 6, 0) for _ in range(lines)) + "\n```")
+    return "\n\n".join(out)
+
+
+def generate_corpus(folder: str, pages: int, blocks: int, mix=None, inline=0.2, seed=0) -> list:
+    '''
+    Writes a synthetic site (content folder, static folder and template) to benchmark builds against
+
+    Inputs:
+        folder: A path-string to an empty folder to create the site in
+        pages: The number of markdown pages to write, spread over nested folders
+        blocks, mix, inline: See synthetic_markdown
+        seed: Seeds the whole corpus
+
+    Outputs:
+        A list of the markdown documents' text
+    '''
+    shutil.copy(TEMPLATE, os.path.join(folder, "template.html"))
+    shutil.copytree(os.path.join(PROJECT, "static"), os.path.join(folder, "static"))
+    documents = []
+    for i in range(pages):
+        # Up to 10 pages per folder, nested two levels deep
+        page_folder = os.path.join(folder, "content", f"section{i // 100}", f"group{i // 10 % 10}", f"page{i}")
+        os.makedirs(page_folder)
+        document = synthetic_markdown(blocks, mix, inline, seed * 1000003 + i)
+        with open(os.path.join(page_folder, "index.md"), "w") as f:
+            f.write(document)
+        documents.append(document)
+    return documents
+
+
+def git_commit() -> str:
+    '''
+    Gets the commit being benchmarked, or None outside a git checkout
+    '''
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def best_of(func, repeat=5) -> float:
+    '''
+    Times a function several times
+
+    Outputs:
+        The fastest run in seconds
+    '''
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def run_build(project: str, *args) -> float:
+    '''
+    Runs main.py as its own process in a project folder, like a real build
+
+    Outputs:
+        The build's wall time in seconds
+    '''
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(PROJECT, "src", "main.py"), *args], cwd=project, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def bench_suite(pages: int, blocks: int, mix=None, inline=0.2, seed=0, jobs=None, repeat=5) -> dict:
+    '''
+    Times every layer of the generator against a synthetic corpus
+
+    Inputs:
+        pages, blocks, mix, inline, seed: See generate_corpus
+        jobs: The worker count for the parallel build (defaults to the CPU count)
+        repeat: How many times to repeat each in-process measurement (the best is kept)
+
+    Outputs:
+        A dict of the parameters, environment and timings in seconds
+    '''
+    jobs = jobs or os.cpu_count()
+    results = {
+        "params": {"pages": pages, "blocks": blocks, "mix": mix or DEFAULT_MIX, "inline": inline, "seed": seed, "jobs": jobs},
+        "environment": {"commit": git_commit(), "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "timings": {},
+    }
+    timings = results["timings"]
+    with tempfile.TemporaryDirectory() as project:
+        documents = generate_corpus(project, pages, blocks, mix, inline, seed)
+        lines = [line for document in documents[:20] for line in document.split("\n")]
+
+        timings["text_to_text_nodes"] = best_of(lambda: [text_to_text_nodes(i) for i in lines], repeat)
+        # Clears the block cache each time so the parser really runs
+        def parse():
+            split_block.clear_block_cache()
+            return [split_block.markdown_to_html_node(i) for i in documents[:20]]
+        timings["markdown_to_html_node"] = best_of(parse, repeat)
+        # Serializes real node trees, since markdown_to_html_node's children are already html
+        nodes = [node_tree(i) for i in documents[:20]]
+        timings["to_html"] = best_of(lambda: [i.to_html() for i in nodes], repeat)
+
+        timings["build_full"] = run_build(project)
+        timings["build_full_parallel"] = run_build(project, "--jobs", str(jobs))
+        timings["build_incremental_cold"] = run_build(project, "--incremental")
+        timings["build_incremental_noop"] = run_build(project, "--incremental")
+        # Touches one page, like fixing a typo
+        with open(os.path.join(project, "content", "section0", "group0", "page0", "index.md"), "a") as f:
+            f.write("\n\nA typo fix")
+        timings["build_incremental_one_page"] = run_build(project, "--incremental")
+    results["timings"]["corpus_pages_per_second"] = pages / timings["build_full"]
+    return results
+
+
+def save_results(results: dict, name: str) -> str:
+    '''
+    Writes benchmark results to .cache/bench/<name>.json so runs can be compared later
+
+    Outputs:
+        The path-string written to
+    '''
+    folder = os.path.join(CACHE, "bench")
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{name}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def compare_results(before_path: str, after_path: str) -> None:
+    '''
+    Prints each timing of two saved runs side by side
+    '''
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    if before["params"] != after["params"]:
+        print("Warning: the runs used different parameters, so timings aren't directly comparable")
+    print(f"{'benchmark':<30}{'before':>12}{'after':>12}{'change':>10}")
+    for name, old in before["timings"].items():
+        new = after["timings"].get(name)
+        if new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        print(f"{name:<30}{old:12.4f}{new:12.4f}{change:+9.1f}%")
+
+
+def count_nodes(node) -> int:
+    '''
+    Counts the nodes in an HTMLNode tree
+    '''
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, ParentNode):
+            stack.extend(node.children)
+    return count
+
+
+def node_tree(markdown: str, basepath="/") -> ParentNode:
+    '''
+    Builds a document's full HTMLNode tree, block by block and without the block cache (markdown_to_html_node's
+    children are each block's remembered html instead)
+    '''
+    blocks = split_block.scan_blocks(markdown)
+    return ParentNode("div", [node for block, block_type in blocks for node in split_block.block_to_html_nodes(block, basepath, block_type)])
+
+
+def peak_rss() -> int:
+    '''
+    Gets the process's peak resident set size in bytes
+    '''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def bench_memory(blocks: int) -> dict:
+    '''
+    Measures the memory used by the node tree of a large synthetic document and by rendering it
+
+    Inputs:
+        blocks: The number of blocks in the document
+
+    Outputs:
+        A dict of the node count, traced bytes per node, and peak memory figures
+    '''
+    markdown = synthetic_markdown(blocks)
+    tracemalloc.start()
+    node, parse_time = timed(node_tree, markdown)
+    tree_bytes = tracemalloc.get_traced_memory()[0]
+    html, render_time = timed(node.to_html)
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    nodes = count_nodes(node)
+    return {
+        "blocks": blocks,
+        "nodes": nodes,
+        # Includes each node's strings, props and child lists, not just the node objects
+        "bytes_per_node": tree_bytes / nodes,
+        "traced_peak_bytes": traced_peak,
+        "peak_rss_bytes": peak_rss(),
+        "parse": parse_time,
+        "to_html": render_time,
+    }
+
+
+def print_results(results: dict) -> None:
+    for k, v in results.items():
+        print(f"{k}: {v:.3f}" if isinstance(v, float) else f"{k}: {v}")
+
+
+def parse_mix(text: str) -> dict:
+    '''
+    Reads a block mix like "paragraph=4,code=1" (kinds left out don't appear)
+    '''
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown block kind {kind!r}, expected one of {', '.join(DEFAULT_MIX)}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the site generator's benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+    suite = sub.add_parser("suite", help="Time parsing, rendering and whole builds on a synthetic corpus")
+    suite.add_argument("--pages", type=int, default=200, help="How many pages the corpus has")
+    suite.add_argument("--blocks", type=int, default=50, help="How many blocks each page has")
+    suite.add_argument("--mix", type=parse_mix, help="Relative block weights, e.g. paragraph=4,code=1,quote=1")
+    suite.add_argument("--inline", type=float, default=0.2, help="The chance of each word being a link, image or emphasis")
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--jobs", type=int, help="Worker processes for the parallel build (defaults to the CPU count)")
+    suite.add_argument("--repeat", type=int, default=5, help="Runs per in-process measurement (the best is kept)")
+    suite.add_argument("--name", default=time.strftime("%Y%m%d-%H%M%S"), help="Saves the results as .cache/bench/<name>.json")
+    compare = sub.add_parser("compare", help="Compare two saved suite runs")
+    compare.add_argument("before")
+    compare.add_argument("after")
+    walk = sub.add_parser("walk", help="Walk, copy and delete one very wide folder")
+    walk.add_argument("--files", type=int, default=100000)
+    memory = sub.add_parser("memory", help="Node memory use and peak RSS for one large synthetic document")
+    memory.add_argument("--blocks", type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.bench == "suite":
+        results = bench_suite(args.pages, args.blocks, args.mix, args.inline, args.seed, args.jobs, args.repeat)
+        print_results(results["timings"])
+        print(f"Saved to {save_results(results, args.name)}")
+    elif args.bench == "compare":
+        compare_results(args.before, args.after)
+    elif args.bench == "walk":
+        print_results(bench_walk(args.files))
+    elif args.bench == "memory":
+        print_results(bench_memory(args.blocks))
+
+
+if __name__ == "__main__":
+    main()
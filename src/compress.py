@@ -0,0 +1,121 @@
+'''
+Writes precompressed variants (index.html.gz, and index.html.br where the brotli module is installed) next to the
+text files in the docs folder, for static hosts that serve them instead of compressing on every request
+'''
+import gzip, os
+from concurrent.futures import ThreadPoolExecutor
+from walk import walk_files
+import profiler
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# File types worth compressing (images and fonts are compressed already)
+COMPRESSIBLE = (".html", ".css", ".js", ".mjs", ".json", ".svg", ".xml", ".txt")
+
+# Formats mapped to the suffix their variants get
+SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+
+def available_formats() -> list:
+    '''
+    Gets the formats this Python can write (brotli isn't in the standard library)
+    '''
+    return [i for i in SUFFIXES if i != "br" or brotli]
+
+
+def compress_bytes(data: bytes, format: str, level=9) -> bytes:
+    '''
+    Compresses data in one of the SUFFIXES formats
+
+    Inputs:
+        data: The bytes to compress
+        format: "gzip" or "br"
+        level: The zlib level (1-9) for gzip; brotli always uses its best quality
+
+    Outputs:
+        The compressed bytes
+    '''
+    if format == "br":
+        return brotli.compress(data, quality=11)
+    # A fixed mtime keeps the output the same from build to build
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_file(path: str, formats: list, level=9) -> int:
+    '''
+    Writes a file's compressed variants, skipping any that are already current
+
+    A variant is given its file's mtime, so it's current while the mtimes match. Variants that wouldn't be smaller
+    than the file aren't written (and any old one is deleted), so hosts fall back to the file itself.
+
+    Inputs:
+        path: A path-string to the file
+        formats: A list of formats to write (see SUFFIXES)
+        level: See compress_bytes
+
+    Outputs:
+        The number of variants written
+    '''
+    with profiler.stage("compression"):
+        stat = os.stat(path)
+        data = None
+        written = 0
+        for format in formats:
+            variant = path + SUFFIXES[format]
+            try:
+                if os.stat(variant).st_mtime_ns == stat.st_mtime_ns:
+                    continue
+            except FileNotFoundError:
+                pass
+            if data is None:
+                with open(path, "rb") as f:
+                    data = f.read()
+            compressed = compress_bytes(data, format, level)
+            if len(compressed) >= len(data):
+                if os.path.exists(variant):
+                    os.remove(variant)
+                continue
+            # Writes to a temporary name first so the host never serves half a file
+            tmp_path = f"{variant}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(compressed)
+            os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            os.replace(tmp_path, variant)
+            written += 1
+        return written
+
+
+def compress_tree(dest: str, formats: list, level=9, jobs=1) -> tuple:
+    '''
+    Brings the compressed variants of every compressible file in a folder up to date, across a pool of threads
+    (zlib releases the GIL while it works)
+
+    Variants whose file is gone, or whose format is no longer wanted, are deleted (so an empty list of formats
+    deletes them all). Only variants of compressible file types count, so an archive like data.tar.gz is left alone.
+
+    Inputs:
+        dest: A path-string to the docs folder
+        formats: A list of formats to write (see SUFFIXES)
+        level: See compress_bytes
+        jobs: The number of threads to compress with
+
+    Outputs:
+        A tuple of the number of variants written and the number deleted
+    '''
+    wanted = tuple(SUFFIXES[i] for i in formats)
+    files = []
+    removed = 0
+    for _, entry in walk_files(dest):
+        base, suffix = os.path.splitext(entry.path)
+        if suffix in SUFFIXES.values() and base.endswith(COMPRESSIBLE):
+            if suffix not in wanted or not os.path.exists(base):
+                os.remove(entry.path)
+                removed += 1
+        elif formats and entry.name.endswith(COMPRESSIBLE):
+            files.append(entry.path)
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="compress") as pool:
+        written = sum(pool.map(lambda path: compress_file(path, formats, level), files))
+    return written, removed
@@ -1,7 +1,19 @@
-import os
+import multiprocessing, os
 
 PROJECT = os.path.dirname(os.path.abspath(__name__))
 PUBLIC = os.path.join(PROJECT, "public")
 STATIC = os.path.join(PROJECT, "static")
 TEMPLATE = os.path.join(PROJECT, "template.html")
 DOCS = os.path.join(PROJECT, "docs")
+CONTENT = os.path.join(PROJECT, "content")
+CACHE = os.path.join(PROJECT, ".cache")
+MANIFEST = os.path.join(CACHE, "manifest.json")
+HASHES = os.path.join(CACHE, "hashes.json")
+IMAGE_CACHE = os.path.join(CACHE, "images")
+
+# Bump this whenever a change to the renderer changes the html it produces, so cached pages are rebuilt
+RENDERER_VERSION = 1
+
+# Worker processes start from a clean server process rather than as forks of the build, which may have asset copy,
+# I/O or live-reload threads running (forking with live threads can leave a child stuck on a lock they held)
+POOL_CONTEXT = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
@@ -0,0 +1,58 @@
+'''
+Content-hashed asset names (index.css becomes index.3f2a9c1b0d.css), so hosts can tell browsers and CDNs to cache
+assets forever: a changed file gets a new name, and the pages and template pointing at it are rebuilt to match
+'''
+import os
+from options import FrozenMap
+import profiler
+
+# File types that get a fingerprinted copy (the ones pages and the template link to)
+FINGERPRINTED = (".css", ".js", ".mjs", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".svg", ".ico", ".woff", ".woff2")
+
+# How many hex characters of the content hash go in the name
+HASH_LENGTH = 10
+
+
+def fingerprinted_path(path: str, digest: str) -> str:
+    '''
+    Puts a content hash in a file name, before its extension
+
+    Inputs:
+        path: A path-string, e.g. "images/tolkien.png"
+        digest: The file's sha256 hex digest
+
+    Outputs:
+        The path with the hash added, e.g. "images/tolkien.3f2a9c1b0d.png"
+    '''
+    base, suffix = os.path.splitext(path)
+    return f"{base}.{digest[:HASH_LENGTH]}{suffix}"
+
+
+class AssetMap(FrozenMap):
+    '''
+    Site-relative asset urls (e.g. "/index.css") mapped to their fingerprinted urls
+    '''
+    pass
+
+
+def fingerprint_assets(plan: dict, hashes) -> tuple:
+    '''
+    Works out the fingerprinted name of every asset in a build plan
+
+    Inputs:
+        plan: A dict mapping output paths to (source path-string, is_page) tuples (see main.plan_outputs)
+        hashes: The manifest.HashCache to hash the assets with
+
+    Outputs:
+        A tuple of the AssetMap and a dict of the fingerprinted outputs to add to the plan, in the plan's format
+    '''
+    urls = {}
+    renamed = {}
+    with profiler.stage("fingerprinting"):
+        for out_path, (src_path, is_page) in plan.items():
+            if is_page or not out_path.endswith(FINGERPRINTED):
+                continue
+            new_path = fingerprinted_path(out_path, hashes.hash(src_path))
+            urls["/" + out_path.replace(os.sep, "/")] = "/" + new_path.replace(os.sep, "/")
+            renamed[new_path] = (src_path, False)
+    return AssetMap(urls), renamed
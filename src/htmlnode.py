@@ -1,4 +1,13 @@
+import patterns
+
+# Elements that never have contents, so minified html leaves off their closing tags
+VOID_ELEMENTS = frozenset(("area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"))
+
+
 class HTMLNode:
+    # Slots keep big trees small (no per-instance __dict__); subclasses declare empty slots to keep it that way
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
@@ -6,15 +15,48 @@ class HTMLNode:
         self.props = props
 
 
-    def to_html(self):
+    def to_html(self, minify=False):
         raise NotImplementedError()
 
 
+    def iter_html(self, minify=False):
+        '''
+        Yields the node's html in fragments, so big trees can be written out without building one huge string
+        '''
+        yield self.to_html(minify)
+
+
+    def write_html(self, fp, buffer_size=512, minify=False) -> None:
+        '''
+        Streams the node's html into a file
+
+        Inputs:
+            fp: A file object opened for writing text
+            buffer_size: How many fragments to gather before each write call
+            minify: Whether to write the shortest equivalent html (see to_html)
+        '''
+        buffer = []
+        for fragment in self.iter_html(minify):
+            buffer.append(fragment)
+            if len(buffer) >= buffer_size:
+                fp.write(''.join(buffer))
+                buffer.clear()
+        fp.write(''.join(buffer))
+
+
     #TODO: Document this properly, I'm not sure what it does
-    def props_to_html(self):
+    def props_to_html(self, minify=False):
         if self.props:
             out = ""
             for k, v in self.props.items():
+                if minify:
+                    # Whitespace in a class list only separates names
+                    if k == "class":
+                        v = " ".join(v.split())
+                    # Quotes are optional around values without spaces, quotes, =, <, > or backticks
+                    if patterns.UNQUOTED_ATTRIBUTE.fullmatch(v):
+                        out += f" {k}={v}"
+                        continue
                 out += f" {k}=\"{v}\""
             return out
         else:
@@ -26,32 +68,55 @@ class HTMLNode:
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag=None, value=None, props=None):
         super().__init__(tag=tag, value=value, props=props)
 
 
-    def to_html(self):
+    def to_html(self, minify=False):
         '''
-        Writes the node's contents to an html string
+        Writes the node's contents to an html string (minified, void elements like <img> have no closing tag)
         '''
         if not self.tag:
             return self.value
+        elif minify and self.tag in VOID_ELEMENTS and not self.value:
+            return f"<{self.tag}{self.props_to_html(True)}>"
         else:
-            return f"<{self.tag}{self.props_to_html()}>{self.value if self.value != None else ''}</{self.tag}>"
+            return f"<{self.tag}{self.props_to_html(minify)}>{self.value if self.value != None else ''}</{self.tag}>"
 
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag=tag, children=children, props=props)
 
 
-    def to_html(self):
+    def to_html(self, minify=False):
         '''
         Writes the node and its children to an html string
         '''
-        if not self.tag:
-            raise ValueError("Parent nodes require tags")
-        if not self.children:
-            raise ValueError("Parent nodes must have associated children")
-        inner = ''.join(list(map(lambda x: x.to_html(), self.children)))
-        return f"<{self.tag}>{inner if inner != None else ''}</{self.tag}>"
+        return ''.join(self.iter_html(minify))
+
+
+    def iter_html(self, minify=False):
+        '''
+        Yields the node and its children as html fragments, walking the tree with a stack instead of recursion
+        '''
+        # Holds nodes still to be written, plus the closing tags (as plain strings) to write after their children
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                yield node
+            elif isinstance(node, ParentNode):
+                if not node.tag:
+                    raise ValueError("Parent nodes require tags")
+                if not node.children:
+                    raise ValueError("Parent nodes must have associated children")
+                yield f"<{node.tag}>"
+                stack.append(f"</{node.tag}>")
+                stack.extend(reversed(node.children))
+            else:
+                yield from node.iter_html(minify)
@@ -0,0 +1,441 @@
+'''
+Optimizes the site's png images with nothing but the standard library: each png is re-encoded without its metadata
+chunks, and smaller copies (e.g. rivendell-480w.png) are made for the img tags' srcset, so browsers on small screens
+don't download the full-size file
+
+Results are cached by the source image's hash, so each image is only decoded and resized once, however many builds
+and output folders use it.
+
+Image sizes (for img width and height attributes) are read from the png header alone, so measuring doesn't need
+optimizing.
+'''
+import os, struct, zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from config import POOL_CONTEXT
+from options import FrozenMap
+import profiler
+
+# Bump this whenever a change here changes the files made, so cached ones are made again
+IMAGE_VERSION = 1
+
+# The widths (in pixels) resized copies are made at, when none are given
+DEFAULT_WIDTHS = (480, 960)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# The signature plus the IHDR chunk's length, type and data: all that's needed for an image's size
+HEADER_SIZE = 29
+
+# Chunks that change how the image looks, so re-encoding keeps them (text, timestamps, exif... are dropped)
+KEPT_CHUNKS = (b"IHDR", b"PLTE", b"tRNS", b"gAMA", b"cHRM", b"sRGB", b"iCCP", b"sBIT")
+
+# PNG colour types mapped to how many channels each pixel has
+CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+
+
+class ImageError(Exception):
+    '''
+    Raised for images this module can't read (the build copies them as they are)
+    '''
+    pass
+
+
+class ImageMap(FrozenMap):
+    '''
+    Site-relative image urls (e.g. "/images/rivendell.png") mapped to (width, height, srcset) tuples, where srcset
+    is a tuple of (url, width) pairs for the image's resized copies, smallest first
+    '''
+    pass
+
+
+def read_chunks(data: bytes) -> list:
+    '''
+    Splits a png file into its chunks
+
+    Inputs:
+        data: The png file's bytes
+
+    Outputs:
+        A list of (chunk type, chunk data) tuples, in file order
+
+    Raises:
+        ImageError if the data isn't a png
+    '''
+    if not data.startswith(PNG_SIGNATURE):
+        raise ImageError("not a png file")
+    chunks = []
+    at = len(PNG_SIGNATURE)
+    while at + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[at:at + 8])
+        chunks.append((kind, data[at + 8:at + 8 + length]))
+        # Skips the length, type, data and crc
+        at += 12 + length
+        if kind == b"IEND":
+            break
+    if not chunks or chunks[0][0] != b"IHDR":
+        raise ImageError("png file has no header")
+    return chunks
+
+
+def write_chunk(kind: bytes, body: bytes) -> bytes:
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+
+def png_header(data: bytes) -> tuple:
+    '''
+    Reads a png's IHDR chunk, which always comes first, so only the file's first HEADER_SIZE bytes are needed
+
+    Inputs:
+        data: The png file's bytes (or just its first HEADER_SIZE)
+
+    Outputs:
+        A tuple of the width, height, bit depth, colour type and interlace method
+
+    Raises:
+        ImageError if the data doesn't start like a png
+    '''
+    if len(data) < HEADER_SIZE or not data.startswith(PNG_SIGNATURE) or data[12:16] != b"IHDR":
+        raise ImageError("not a png file")
+    width, height, depth, color, _, _, interlace = struct.unpack(">IIBBBBB", data[16:HEADER_SIZE])
+    return width, height, depth, color, interlace
+
+
+@lru_cache(maxsize=None)
+def _png_size(path: str, mtime_ns: int, size: int):
+    with open(path, "rb") as f:
+        try:
+            return png_header(f.read(HEADER_SIZE))[:2]
+        except ImageError:
+            return None
+
+
+def image_size(path: str):
+    '''
+    Gets a png's width and height from its header, reading each file only once while it's unchanged (so watch mode
+    rebuilds don't read them again)
+
+    Inputs:
+        path: A path-string to the png
+
+    Outputs:
+        A (width, height) tuple, or None if the file isn't a png
+    '''
+    stat = os.stat(path)
+    # The file's mtime and size are part of the cache key, so an edited image is read again
+    return _png_size(path, stat.st_mtime_ns, stat.st_size)
+
+
+def measure_images(plan: dict) -> ImageMap:
+    '''
+    Reads the size of every png asset in a build plan, without optimizing them
+
+    Inputs:
+        plan: A dict mapping output paths to (source path-string, is_page) tuples (see main.plan_outputs)
+
+    Outputs:
+        An ImageMap of each png's width and height (with no resized copies)
+    '''
+    found = {}
+    with profiler.stage("image sizes"):
+        for out_path, (src_path, is_page) in plan.items():
+            if is_page or not out_path.lower().endswith(".png"):
+                continue
+            size = image_size(src_path)
+            if size:
+                found["/" + out_path.replace(os.sep, "/")] = (*size, ())
+    return ImageMap(found)
+
+
+def recompress_png(data: bytes, level=9) -> bytes:
+    '''
+    Re-encodes a png losslessly: its pixel data is compressed again at the given zlib level, as a single IDAT chunk,
+    and metadata chunks are dropped. The scanlines aren't decoded, so this works on any still png (an animated
+    one's extra frames would be dropped too).
+
+    Inputs:
+        data: The png file's bytes
+        level: The zlib level (1-9)
+
+    Outputs:
+        The re-encoded png's bytes
+    '''
+    chunks = read_chunks(data)
+    pixels = zlib.decompress(b"".join(body for kind, body in chunks if kind == b"IDAT"))
+    out = [PNG_SIGNATURE]
+    out.extend(write_chunk(kind, body) for kind, body in chunks if kind in KEPT_CHUNKS)
+    out.append(write_chunk(b"IDAT", zlib.compress(pixels, level)))
+    out.append(write_chunk(b"IEND", b""))
+    return b"".join(out)
+
+
+def unfilter(filtered: bytes, width: int, height: int, bpp: int) -> list:
+    '''
+    Undoes the per-scanline filters of a png's decompressed pixel data
+
+    Inputs:
+        filtered: The decompressed IDAT data
+        width, height: The image's size in pixels
+        bpp: Bytes per pixel
+
+    Outputs:
+        A list of each row's raw bytes
+    '''
+    stride = width * bpp
+    prev = bytes(stride)
+    rows = []
+    for y in range(height):
+        start = y * (stride + 1)
+        kind = filtered[start]
+        line = bytearray(filtered[start + 1:start + 1 + stride])
+        if kind == 1:
+            for i in range(bpp, stride):
+                line[i] = (line[i] + line[i - bpp]) & 255
+        elif kind == 2:
+            line = bytearray(map(lambda a, b: (a + b) & 255, line, prev))
+        elif kind == 3:
+            for i in range(stride):
+                left = line[i - bpp] if i >= bpp else 0
+                line[i] = (line[i] + ((left + prev[i]) >> 1)) & 255
+        elif kind == 4:
+            for i in range(stride):
+                if i >= bpp:
+                    a, c = line[i - bpp], prev[i - bpp]
+                else:
+                    a = c = 0
+                b = prev[i]
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                line[i] = (line[i] + (a if pa <= pb and pa <= pc else b if pb <= pc else c)) & 255
+        elif kind != 0:
+            raise ImageError(f"unknown png filter type {kind}")
+        rows.append(bytes(line))
+        prev = line
+    return rows
+
+
+def decode_png(data: bytes) -> tuple:
+    '''
+    Decodes an 8-bit, non-interlaced greyscale, rgb or rgba png (with or without alpha) into rows of pixels
+
+    Inputs:
+        data: The png file's bytes
+
+    Outputs:
+        A tuple of the width, height, colour type and a list of each row's bytes
+
+    Raises:
+        ImageError for pngs in any other format (palettes, 16-bit channels, interlacing)
+    '''
+    width, height, depth, color, interlace = png_header(data)
+    if depth != 8 or color not in CHANNELS or interlace:
+        raise ImageError(f"unsupported png format (bit depth {depth}, colour type {color}, interlace {interlace})")
+    chunks = read_chunks(data)
+    filtered = zlib.decompress(b"".join(body for kind, body in chunks if kind == b"IDAT"))
+    return width, height, color, unfilter(filtered, width, height, CHANNELS[color])
+
+
+def encode_png(width: int, height: int, color: int, rows: list, level=9) -> bytes:
+    '''
+    Encodes rows of 8-bit pixels as a png, giving each row whichever of the None, Sub and Up filters looks likely
+    to compress best (the smallest sum of filtered bytes, read as signed)
+
+    Inputs:
+        width, height: The image's size in pixels
+        color: The png colour type (see CHANNELS)
+        rows: A list of each row's bytes
+        level: The zlib level (1-9)
+
+    Outputs:
+        The png file's bytes
+    '''
+    bpp = CHANNELS[color]
+    # How far each filtered byte is from 0, whichever way it wraps
+    cost = bytes(min(i, 256 - i) for i in range(256))
+    prev = bytes(width * bpp)
+    out = bytearray()
+    for row in rows:
+        candidates = [
+            (0, row),
+            (1, row[:bpp] + bytes(map(lambda a, b: (a - b) & 255, row[bpp:], row))),
+            (2, bytes(map(lambda a, b: (a - b) & 255, row, prev))),
+        ]
+        kind, line = min(candidates, key=lambda i: sum(i[1].translate(cost)))
+        out.append(kind)
+        out += line
+        prev = row
+    header = struct.pack(">IIBBBBB", width, height, 8, color, 0, 0, 0)
+    return b"".join([PNG_SIGNATURE, write_chunk(b"IHDR", header), write_chunk(b"IDAT", zlib.compress(bytes(out), level)), write_chunk(b"IEND", b"")])
+
+
+def resize_rows(width: int, height: int, bpp: int, rows: list, new_width: int) -> tuple:
+    '''
+    Shrinks an image by averaging the box of source pixels behind each new pixel (an area-average filter)
+
+    Inputs:
+        width, height: The image's size in pixels
+        bpp: Bytes per pixel
+        rows: A list of each row's bytes
+        new_width: The width to shrink to, keeping the aspect ratio
+
+    Outputs:
+        A tuple of the new height and the new list of rows
+    '''
+    new_height = max(1, round(height * new_width / width))
+    # Each new column or row covers the source columns or rows from its start up to the next one's
+    xs = [x * width // new_width for x in range(new_width + 1)]
+    ys = [y * height // new_height for y in range(new_height + 1)]
+    out = []
+    for y in range(new_height):
+        box = rows[ys[y]:max(ys[y + 1], ys[y] + 1)]
+        # Sums the box's rows column by column (zip and sum run in C), then the columns in each box
+        column_sums = list(map(sum, zip(*box))) if len(box) > 1 else box[0]
+        line = bytearray(new_width * bpp)
+        for x in range(new_width):
+            x0, x1 = xs[x], max(xs[x + 1], xs[x] + 1)
+            area = (x1 - x0) * len(box)
+            for channel in range(bpp):
+                total = sum(column_sums[x0 * bpp + channel:x1 * bpp:bpp])
+                line[x * bpp + channel] = (total + area // 2) // area
+        out.append(bytes(line))
+    return new_height, out
+
+
+def variant_path(path: str, width: int) -> str:
+    '''
+    Names a resized copy of an image, e.g. images/rivendell.png at 480 pixels becomes images/rivendell-480w.png
+    '''
+    base, suffix = os.path.splitext(path)
+    return f"{base}-{width}w{suffix}"
+
+
+def process_image(src_path: str, digest: str, widths: tuple, cache_folder: str) -> tuple:
+    '''
+    Makes an image's re-encoded and resized copies in the cache, unless they're there already
+
+    Inputs:
+        src_path: A path-string to the png
+        digest: The png's sha256 hex digest, which names its cache entry
+        widths: The widths to make resized copies at (those not narrower than the image are skipped)
+        cache_folder: A path-string to the image cache
+
+    Outputs:
+        A tuple of the image's width, its height, a path-string to the file to publish in its place (the source,
+        if re-encoding didn't make it smaller) and a list of (width, path-string) tuples of its resized copies
+    '''
+    with profiler.stage("image optimization"):
+        folder = os.path.join(cache_folder, f"{digest}-{IMAGE_VERSION}")
+        with open(src_path, "rb") as f:
+            data = f.read()
+        width, height = png_header(data)[:2]
+        # Animated pngs are published as they are, since re-encoding and resizing would keep only the first frame
+        if any(kind == b"acTL" for kind, _ in read_chunks(data)):
+            return width, height, src_path, []
+        os.makedirs(folder, exist_ok=True)
+        optimized = os.path.join(folder, "full.png")
+        smaller = os.path.join(folder, "full.smaller")
+        # Remembers whether re-encoding helped with an empty marker file, so it's only ever tried once
+        if not os.path.exists(optimized) and not os.path.exists(smaller):
+            recompressed = recompress_png(data)
+            if len(recompressed) < len(data):
+                write_file(optimized, recompressed)
+            else:
+                write_file(smaller, b"")
+        wanted = [(i, os.path.join(folder, f"{i}.png")) for i in sorted(set(widths)) if i < width]
+        variants = []
+        pixels = None
+        for new_width, path in wanted:
+            if not os.path.exists(path):
+                if pixels is None:
+                    try:
+                        pixels = decode_png(data)
+                    except ImageError:
+                        # Published at full size only
+                        break
+                _, _, color, rows = pixels
+                new_height, new_rows = resize_rows(width, height, CHANNELS[color], rows, new_width)
+                write_file(path, encode_png(new_width, new_height, color, new_rows))
+            variants.append((new_width, path))
+        return width, height, optimized if os.path.exists(optimized) else src_path, variants
+
+
+def cached_image(src_path: str, digest: str, widths: tuple, cache_folder: str) -> tuple:
+    '''
+    Looks up the copies process_image has already made of an image, without decoding it or making anything
+
+    Inputs:
+        src_path, digest, widths, cache_folder: See process_image
+
+    Outputs:
+        A tuple like process_image's, with only the copies already in the cache (or an ImageError, in place of the
+        tuple, if the file isn't a png)
+    '''
+    size = image_size(src_path)
+    if size is None:
+        return ImageError("not a png file")
+    folder = os.path.join(cache_folder, f"{digest}-{IMAGE_VERSION}")
+    optimized = os.path.join(folder, "full.png")
+    wanted = [(i, os.path.join(folder, f"{i}.png")) for i in sorted(set(widths)) if i < size[0]]
+    variants = [(new_width, path) for new_width, path in wanted if os.path.exists(path)]
+    return *size, optimized if os.path.exists(optimized) else src_path, variants
+
+
+def try_process_image(*args) -> tuple:
+    # Hands a broken png back as its exception instead of raising it, so one bad file doesn't stop the pool
+    try:
+        return process_image(*args)
+    except (ImageError, zlib.error) as e:
+        return e
+
+
+def write_file(path: str, data: bytes) -> None:
+    # Writes to a temporary name first so a crash (or a parallel build) never leaves half a file in the cache
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def optimize_images(plan: dict, widths: tuple, hashes, cache_folder: str, jobs=1, read_only=False) -> tuple:
+    '''
+    Optimizes every png asset in a build plan, across a pool of worker processes
+
+    Inputs:
+        plan: A dict mapping output paths to (source path-string, is_page) tuples (see main.plan_outputs)
+        widths: The widths to make resized copies at
+        hashes: The HashCache to hash the images with
+        cache_folder: A path-string to the image cache
+        jobs: The number of worker processes to decode and resize with
+        read_only: Whether to only look up the copies already in the cache (see cached_image), e.g. for --explain
+
+    Outputs:
+        A tuple of the ImageMap and a dict of outputs to update the plan with (each png's re-encoded copy and its
+        resized copies), in the plan's format
+    '''
+    images = [(out_path, src_path) for out_path, (src_path, is_page) in plan.items() if not is_page and out_path.lower().endswith(".png")]
+    jobs_args = [(src_path, hashes.hash(src_path), tuple(widths), cache_folder) for _, src_path in images]
+    if read_only:
+        results = [cached_image(*i) for i in jobs_args]
+    elif jobs > 1 and len(images) > 1:
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=POOL_CONTEXT) as pool:
+            results = list(pool.map(try_process_image, *zip(*jobs_args)))
+    else:
+        results = [try_process_image(*i) for i in jobs_args]
+    found = {}
+    updates = {}
+    for (out_path, _), result in zip(images, results):
+        # Files that only look like pngs are copied as they are, without sizes
+        if isinstance(result, Exception):
+            continue
+        width, height, published, variants = result
+        updates[out_path] = (published, False)
+        srcset = []
+        for new_width, path in variants:
+            new_out_path = variant_path(out_path, new_width)
+            updates[new_out_path] = (path, False)
+            srcset.append(("/" + new_out_path.replace(os.sep, "/"), new_width))
+        if srcset:
+            # The full-size image is the largest candidate
+            srcset.append(("/" + out_path.replace(os.sep, "/"), width))
+        found["/" + out_path.replace(os.sep, "/")] = (width, height, tuple(srcset))
+    return ImageMap(found), updates
@@ -1,13 +1,27 @@
 from textnode import TextNode, TextType
 from htmlnode import HTMLNode, LeafNode, ParentNode
 from config import *
+from manifest import HashCache, Manifest
+from walk import walk_files, walk_dirs, remove_tree
+from template import load_template
+from page_cache import PageCache
+from stream import STREAM_THRESHOLD, find_title, open_markdown, stream_page
+import watch
+from sync import LINK_MODES, AssetCopier, place_file, sync_file, remove_stale
+from compress import SUFFIXES, available_formats, compress_tree
+from options import BuildSettings, RenderOptions
+from fingerprint import fingerprint_assets
+from images import DEFAULT_WIDTHS, measure_images, optimize_images
 import split_block
-import re, os, shutil, pathlib, sys
+import profiler
+import os, shutil, sys, argparse, io, contextlib, asyncio
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 
 def rm_r(folder: str) -> None:
     '''
-    Recursively deletes a folder (emulates rm -r on Unix)
+    Deletes a folder and its contents (emulates rm -r on Unix)
 
     Inputs:
         folder: A string containing the target path
@@ -15,67 +29,29 @@ def rm_r(folder: str) -> None:
     Outputs:
         None
     '''
-    # Fetches the contents of the folder
-    items = os.listdir(folder)
-    # Checks if the folder contains anything
-    if len(items) > 0:
-        # Makes a path string from the item
-        item_path = os.path.join(folder, items[0])
-        # Removes the item if it's a file
-        if os.path.isfile(item_path):
-            os.remove(item_path)
-        # Recursively deletes the item if it's a folder
-        else:
-            rm_r(item_path)
-        # Recurses until the folder is empty
-        rm_r(folder)
-    else:
-        # Deletes the main folder and returns
-        os.rmdir(folder)
-        return
+    # Walks the folder with an explicit stack, so huge folders can't hit the recursion limit
+    remove_tree(folder)
 
 
-def copy_contents(src: str, dest: str, depth=0) -> None:
+def copy_contents(src: str, dest: str) -> None:
     '''
     Copies the contents of one folder to another, by deleting and recreating the destination folder
 
     Inputs:
         src: A path-string of the folder you want to copy
         dest: A path-string of the folder you want to copy to
-        depth: The recursion depth (defaults to 0; any user wouldn't need to modify this)
 
     Outputs:
         None
     '''
-    # Removes the folder if recursion depth is 0
-    if depth < 1:
-        if os.path.exists(dest):
-            rm_r(dest)
-        os.mkdir(dest)
-
-    # Gathers the items in the source folder if they aren't already in the destination folder
-    src_items = os.listdir(src)
-    dest_items = os.listdir(dest)
-    copy_items = [i for i in src_items if i not in dest_items]
-
-    # If there are any items to copy, continues, otherwise returns
-    if len(copy_items) > 0:
-        item = copy_items[0]
-    else:
-        return
-
-    # Sets the item and destination paths
-    item_path = os.path.join(src, item)
-    dest_path = os.path.join(dest, item)
-
-    # Copies the item if it's a file, otherwise recursively copies the folder
-    if os.path.isfile(item_path):
-        shutil.copy(item_path, dest_path)
-    else:
-        os.mkdir(dest_path)
-        copy_contents(item_path, dest_path, 1)
-    # Recurses until there's nothing left to copy
-    copy_contents(src, dest, 1)
+    if os.path.exists(dest):
+        rm_r(dest)
+    os.mkdir(dest)
+    # Recreates the folder structure first, then copies the files into it
+    for _, rel_path in walk_dirs(src):
+        os.mkdir(os.path.join(dest, rel_path))
+    for rel_path, entry in walk_files(src):
+        shutil.copy(entry.path, os.path.join(dest, rel_path))
 
 
 def extract_title(markdown: str) -> str:
@@ -88,17 +64,14 @@ def extract_title(markdown: str) -> str:
     Outputs:
         A string of the title without the markdown notation
     '''
-    lines = markdown.split("\n")
-    # Checks for the title line using regex
-    title = [line for line in lines if re.match("^# .*", line) != None]
-    if title == []:
+    # Jumps straight to the first title line rather than splitting the whole document into lines
+    title = find_title(markdown)
+    if title == None:
         raise Exception("Markdown must have a title")
-    else:
-        title = title[0]
-        return re.sub("^# ", "", title)
+    return title
 
 
-def generate_page(from_path: str, template_path: str, dest_path: str, basepath: str) -> None:
+def generate_page(from_path: str, template_path: str, dest_path: str, basepath: str, cache=None, mapped=False, options=RenderOptions()) -> None:
     '''
     Generates a page of html at a specified destination folder given a path to a markdown file
 
@@ -107,71 +80,722 @@ def generate_page(from_path: str, template_path: str, dest_path: str, basepath:
         template_path: A path-string to the html template
         dest_path: A path-string to the file you want to make
         basepath: The program's root directory
+        cache: An optional PageCache to reuse previously rendered pages from
+        mapped: Whether to memory-map very large pages rather than read them in chunks
+        options: The RenderOptions to render with
 
     Outputs:
         None
     '''
     print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    with open(from_path, "r") as md, open(template_path, "r") as template, open(dest_path, "w") as output:
-        md = md.read()
-        template = template.read()
-        # Gets the title from the markdown file
+    with profiler.stage("template load"):
+        # The template is parsed once per build (and basepath) rather than once per page
+        template = load_template(template_path, basepath, options.minify, options.assets)
+    # Very large pages are read, rendered and written a block at a time instead of in whole
+    if os.path.getsize(from_path) >= STREAM_THRESHOLD:
+        generate_streamed_page(from_path, template, dest_path, basepath, cache=cache, mapped=mapped, options=options)
+        return
+    with profiler.stage("read"):
+        with open(from_path, "r") as md:
+            md = md.read()
+    # Copies the page out of the cache if the same markdown has been rendered with this template before
+    if cache:
+        with profiler.stage("page cache"):
+            key = cache.key(md, template.digest, basepath, options)
+            if cache.get(key, dest_path):
+                return
+    # Gets the title from the markdown file
+    with profiler.stage("title extraction"):
         title = extract_title(md)
-        # Gets the node built from markdown_to_html_node
-        html_node = split_block.markdown_to_html_node(md)
-        # Outputs the node to a string of html
-        html_node = html_node.to_html()
-        # Modifies the template using regex
-        out = template
-        out = re.sub("{{ Title }}", title, out)
-        out = re.sub("{{ Content }}", html_node, out)
-        # This part ensures that the resource paths are correct for deployment
-        out = re.sub('href="/', f'href="{basepath}', out)
-        out = re.sub('src="/', f'src="{basepath}', out)
-        output.write(out)
+    # Gets the node built from markdown_to_html_node, with its links already pointing under the basepath
+    html_node = split_block.markdown_to_html_node(md, basepath, options)
+    if profiler.active:
+        # Fills the template and writes separately so each can be timed (at the cost of not streaming)
+        with profiler.stage("template fill"):
+            html = template.render(Title=title, Content=html_node)
+        with profiler.stage("write"):
+            with open(dest_path, "w") as output:
+                output.write(html)
+    else:
+        # Streams the filled-in template into the output file
+        with open(dest_path, "w") as output:
+            template.write(output, Title=title, Content=html_node)
+    if cache:
+        with profiler.stage("page cache"):
+            cache.put(key, dest_path)
 
 
-def generate_pages_recursive(dir_path_content: str, template_path: str, dest_dir_path: str, basepath: str) -> None:
+def generate_streamed_page(from_path: str, template, dest_path: str, basepath: str, cache=None, mapped=False, options=RenderOptions()) -> None:
     '''
-    Recursively copies the contents of the content folder to the public folder in HTML form
+    Generates a page like generate_page, but without ever holding the whole markdown file or html page in memory
+
+    Inputs:
+        from_path: A path-string to the markdown file
+        template: The parsed Template object
+        dest_path: A path-string to the file you want to make
+        basepath: The program's root directory
+        cache: An optional PageCache to reuse previously rendered pages from
+        mapped: Whether to memory-map the markdown file rather than read it in chunks
+        options: The RenderOptions to render with
     '''
-    if dir_path_content == []:
-        return
+    with open_markdown(from_path, mapped) as markdown:
+        if cache:
+            with profiler.stage("page cache"):
+                # Hashes the file without reading it in whole, giving the same key as the whole file would
+                key = cache.digest_key(markdown.digest(), template.digest, basepath, options)
+                if cache.get(key, dest_path):
+                    return
+        try:
+            with open(dest_path, "w") as output:
+                stream_page(markdown, template, output, basepath, options)
+        except Exception:
+            # Doesn't leave half a page behind (a missing title is only known once the whole file has been read)
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+            raise
+    if cache:
+        with profiler.stage("page cache"):
+            cache.put(key, dest_path)
+
+
+class BuildError(Exception):
+    '''
+    Raised once every page and asset has been attempted, when one or more of them failed to build
+    '''
+    def __init__(self, failures: list):
+        # A list of (source path-string, exception) tuples in build order
+        self.failures = failures
+        lines = [f"{path}: {type(e).__name__}: {e}" for path, e in failures]
+        super().__init__(f"{len(failures)} file(s) failed to build:\n" + "\n".join(lines))
+
+
+def render_page_job(from_path: str, template_path: str, dest_path: str, basepath: str, cache=None, profile=False, mapped=False, options=RenderOptions()) -> tuple:
+    '''
+    Runs generate_page in a worker process, capturing what it prints so the parent can replay it in order
+
+    Outputs:
+        A tuple of the text generate_page printed and the page's stage timings (None unless profiling)
+    '''
+    if profile and profiler.active is None:
+        profiler.active = profiler.Profiler()
+    log = io.StringIO()
+    record = None
+    with contextlib.redirect_stdout(log), profiler.page(from_path) as record:
+        generate_page(from_path, template_path, dest_path, basepath, cache=cache, mapped=mapped, options=options)
+    return log.getvalue(), record
+
+
+def render_pages(pages: list, template_path: str, basepath: str, cache=None, options=RenderOptions(), settings=BuildSettings()) -> list:
+    '''
+    Generates a list of pages, either one at a time or across a pool of worker processes
+
+    Inputs:
+        pages: A list of (markdown path-string, html path-string) tuples
+        template_path: A path-string to the html template
+        basepath: The program's root directory
+        cache: An optional PageCache to reuse previously rendered pages from
+        options: The RenderOptions to render with
+        settings: The BuildSettings to render with (jobs, mapped and inflight are used here)
+
+    Outputs:
+        A list of the pages that were generated successfully, in input order
+
+    Raises:
+        BuildError listing every page that failed, after all the others have been generated
+    '''
+    done = []
+    failures = []
+    if settings.inflight:
+        done, failures = asyncio.run(render_pages_async(pages, template_path, basepath, cache=cache, options=options, settings=settings))
+    elif settings.jobs > 1:
+        with ProcessPoolExecutor(max_workers=settings.jobs, mp_context=POOL_CONTEXT) as pool:
+            profile = profiler.active is not None
+            job = partial(render_page_job, template_path=template_path, basepath=basepath, cache=cache, profile=profile, mapped=settings.mapped, options=options)
+            futures = [pool.submit(job, src, dest_path=dst) for src, dst in pages]
+            # Collects results in submission order so the log and error report are deterministic
+            for page, future in zip(pages, futures):
+                try:
+                    log, record = future.result()
+                    print(log, end="")
+                    if profile:
+                        profiler.active.add_page(page[0], record)
+                    done.append(page)
+                except Exception as e:
+                    failures.append((page[0], e))
+    else:
+        for page in pages:
+            try:
+                with profiler.page(page[0]):
+                    generate_page(page[0], template_path, page[1], basepath, cache=cache, mapped=settings.mapped, options=options)
+                done.append(page)
+            except Exception as e:
+                failures.append((page[0], e))
+    if failures:
+        raise BuildError(failures)
+    return done
+
+
+def render_page_html(markdown: str, template_path: str, basepath: str, from_path: str, profile=False, options=RenderOptions()) -> tuple:
+    '''
+    Renders a page's markdown into its template, for the asyncio pipeline to write out (in a worker thread or process)
+
+    Outputs:
+        A tuple of the page's html and its stage timings (None unless profiling)
+    '''
+    if profile and profiler.active is None:
+        profiler.active = profiler.Profiler()
+    record = None
+    with profiler.page(from_path) as record:
+        with profiler.stage("template load"):
+            template = load_template(template_path, basepath, options.minify, options.assets)
+        with profiler.stage("title extraction"):
+            title = extract_title(markdown)
+        html_node = split_block.markdown_to_html_node(markdown, basepath, options)
+        with profiler.stage("template fill"):
+            html = template.render(Title=title, Content=html_node)
+    return html, record
+
+
+def generate_large_page(from_path: str, template_path: str, dest_path: str, basepath: str, cache=None, mapped=False, options=RenderOptions()) -> None:
+    '''
+    Runs generate_page for a page too big for the asyncio pipeline to hold, timing it as a page when profiling
+    '''
+    with profiler.page(from_path):
+        generate_page(from_path, template_path, dest_path, basepath, cache=cache, mapped=mapped, options=options)
+
+
+def read_source(path: str) -> str:
+    with profiler.stage("read"):
+        with open(path, "r") as f:
+            return f.read()
+
+
+def write_output(path: str, html: str) -> None:
+    with profiler.stage("write"):
+        with open(path, "w") as f:
+            f.write(html)
+
+
+async def render_pages_async(pages: list, template_path: str, basepath: str, cache=None, options=RenderOptions(), settings=BuildSettings(inflight=16)) -> tuple:
+    '''
+    Generates pages on an asyncio pipeline: sources are read and outputs written on a pool of I/O threads while
+    other pages render, so slow storage (e.g. NFS) waits overlap with rendering instead of adding to it
+
+    Inputs:
+        pages, template_path, basepath, cache, options: See render_pages
+        settings: The BuildSettings to render with, whose inflight is the most pages read, rendering or being
+            written at once (which bounds the html held in memory)
+
+    Outputs:
+        A tuple of the pages generated successfully and a list of (source path-string, exception) tuples for the
+        ones that failed, both in input order
+    '''
+    loop = asyncio.get_running_loop()
+    profile = profiler.active is not None
+    jobs = settings.jobs
+    limit = asyncio.Semaphore(settings.inflight)
+    template = load_template(template_path, basepath, options.minify, options.assets)
+    # Renders in worker processes with --jobs, otherwise on one thread so this one stays free to schedule I/O
+    render_pool = ProcessPoolExecutor(max_workers=jobs, mp_context=POOL_CONTEXT) if jobs > 1 else ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+    io_pool = ThreadPoolExecutor(max_workers=settings.inflight, thread_name_prefix="io")
+    # run_in_executor only passes arguments positionally, so the build-wide ones are bound by keyword up front
+    page_job = partial(render_page_job, template_path=template_path, basepath=basepath, cache=cache, profile=profile, mapped=settings.mapped, options=options)
+    large_page = partial(generate_large_page, template_path=template_path, basepath=basepath, cache=cache, mapped=settings.mapped, options=options)
+    page_html = partial(render_page_html, template_path=template_path, basepath=basepath, profile=profile, options=options)
+
+    async def build_page(from_path, dest_path):
+        run_io = lambda func, *args: loop.run_in_executor(io_pool, func, *args)
+        # Waiting pages queue up in order, so pages start (and log) in input order
+        async with limit:
+            if await run_io(os.path.getsize, from_path) >= STREAM_THRESHOLD:
+                # Streamed from start to finish by a renderer rather than held in memory here
+                if jobs > 1:
+                    log, record = await loop.run_in_executor(render_pool, partial(page_job, from_path, dest_path=dest_path))
+                    print(log, end="")
+                    if profile:
+                        profiler.active.add_page(from_path, record)
+                else:
+                    await loop.run_in_executor(render_pool, partial(large_page, from_path, dest_path=dest_path))
+                return
+            print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+            markdown = await run_io(read_source, from_path)
+            if cache:
+                key = cache.key(markdown, template.digest, basepath, options)
+                if await run_io(cache.get, key, dest_path):
+                    return
+            html, record = await loop.run_in_executor(render_pool, partial(page_html, markdown, from_path=from_path))
+            # Worker processes time pages in their own profiler, so their records are copied over
+            if profile and jobs > 1:
+                profiler.active.add_page(from_path, record)
+            await run_io(write_output, dest_path, html)
+            if cache:
+                await run_io(cache.put, key, dest_path)
+
+    with render_pool, io_pool:
+        results = await asyncio.gather(*(build_page(*page) for page in pages), return_exceptions=True)
+    done = [page for page, result in zip(pages, results) if not isinstance(result, BaseException)]
+    failures = [(page[0], result) for page, result in zip(pages, results) if isinstance(result, BaseException)]
+    return done, failures
+
+
+def render_and_copy(pages: list, copier: AssetCopier, template_path: str, basepath: str, cache=None, options=RenderOptions(), settings=BuildSettings()) -> list:
+    '''
+    Renders pages while the copier's asset copies carry on in the background, then waits for both
+
+    Inputs:
+        pages: A list of (markdown path-string, html path-string) tuples
+        copier: An AssetCopier the build's assets have been queued on
+        template_path, basepath, cache, options, settings: See render_pages
+
+    Outputs:
+        A list of the pages that were generated successfully, in input order
+
+    Raises:
+        BuildError listing every page and asset that failed, once everything else has finished
+    '''
+    failures = []
+    try:
+        done = render_pages(pages, template_path, basepath, cache=cache, options=options, settings=settings)
+    except BuildError as e:
+        failures = e.failures
+        failed = {path for path, _ in failures}
+        done = [i for i in pages if i[0] not in failed]
+    # The barrier: no build finishes before its assets are in place
+    failures.extend(copier.wait())
+    if failures:
+        raise BuildError(failures)
+    return done
+
+
+def plan_outputs(static: str, content: str) -> dict:
+    '''
+    Works out every file the build should produce and the source it comes from
+
+    Inputs:
+        static: A path-string to the static folder (or None to only plan the content folder)
+        content: A path-string to the content folder
+
+    Outputs:
+        A dict mapping output paths (relative to the docs folder) to (source path-string, is_page) tuples,
+        sorted so that builds process files in a deterministic order
+    '''
+    plan = {}
+    # Static files go in first so content files with the same name override them, like a full build
+    for root in (static, content):
+        if root is None:
+            continue
+        for out_path, entry in walk_files(root):
+            src_path = entry.path
+            # Markdown files become html pages
+            is_page = root == content and out_path.endswith(".md")
+            if is_page:
+                out_path = out_path[:-3] + ".html"
+            plan[out_path] = (src_path, is_page)
+    return plan
+
+
+def remove_output(dest: str, out_path: str) -> None:
+    '''
+    Deletes a built file and any folders it leaves empty
+
+    Inputs:
+        dest: A path-string to the docs folder
+        out_path: The file's path relative to the docs folder
+    '''
+    path = os.path.join(dest, out_path)
+    # Takes any precompressed variants with it
+    for variant in [path, *(path + i for i in SUFFIXES.values())]:
+        if os.path.exists(variant):
+            os.remove(variant)
+    # Walks back up towards the docs folder removing empty parents
+    folder = os.path.dirname(path)
+    while folder != dest and os.path.isdir(folder) and not os.listdir(folder):
+        os.rmdir(folder)
+        folder = os.path.dirname(folder)
+
+
+def process_assets(plan: dict, options: RenderOptions, settings=BuildSettings(), read_only=False) -> RenderOptions:
+    '''
+    Runs the asset stages that change which files the build publishes, updating the plan to match: optimizing pngs
+    (publishing re-encoded copies in their place, plus resized copies), then fingerprinting (adding a content-hashed
+    copy of each asset, while keeping the originals so urls the build can't rewrite, like those inside css files,
+    still work)
+
+    Inputs:
+        plan: The build plan from plan_outputs, updated in place
+        options: The RenderOptions the build was asked for
+        settings: The BuildSettings saying which stages to run (fingerprint, image_widths and image_sizes, where
+            optimized images always get their sizes) and how many worker processes to optimize images with (jobs)
+        read_only: Whether to leave the image and hash caches as they are, only reading what's already in them
+
+    Outputs:
+        The RenderOptions to render pages with, pointing them at the images' sizes and the fingerprinted names
+    '''
+    if settings.image_sizes and settings.image_widths is None:
+        options = options._replace(images=measure_images(plan))
+    if not settings.fingerprint and settings.image_widths is None:
+        return options
+    hashes = HashCache(HASHES)
+    if settings.image_widths is not None:
+        images, updates = optimize_images(plan, settings.image_widths, hashes, IMAGE_CACHE, settings.jobs, read_only)
+        plan.update(updates)
+        options = options._replace(images=images)
+    if settings.fingerprint:
+        # Runs after optimizing so the hashes are of the files actually published
+        assets, renamed = fingerprint_assets(plan, hashes)
+        plan.update(renamed)
+        options = options._replace(assets=assets)
+    if not read_only:
+        hashes.save()
+    return options
+
+
+def template_inputs(manifest: Manifest, template_path: str, basepath: str) -> dict:
+    '''
+    Gets the files every page depends on through the template: the template itself and any partials it includes
+
+    Outputs:
+        A dict of paths relative to the project root mapped to their hashes
+    '''
+    template = load_template(template_path, basepath)
+    paths = [template_path, *template.includes]
+    return {manifest.relative(path): manifest.source_hash(path) for path in paths}
+
+
+def output_entry(manifest: Manifest, src_path: str, is_page: bool, page_inputs: dict, basepath: str, options=RenderOptions()) -> dict:
+    '''
+    Describes everything an output depends on, so any change to them forces a rebuild
+
+    Inputs:
+        manifest: The build's Manifest
+        src_path: A path-string to the output's source file
+        is_page: Whether the output is a page rendered from markdown rather than a copied asset
+        page_inputs: The inputs every page shares (see template_inputs)
+        basepath: The program's root directory
+        options: The RenderOptions pages are rendered with
+
+    Outputs:
+        A dict of the output's inputs (and, for pages, the basepath and render options)
+    '''
+    entry = {"inputs": {manifest.relative(src_path): manifest.source_hash(src_path)}}
+    if is_page:
+        entry["inputs"].update(page_inputs)
+        entry["basepath"] = basepath
+        entry["options"] = options.summary()
+    return entry
+
+
+def explain(path: str, basepath: str, static=STATIC, content=CONTENT, template_path=TEMPLATE, dest=DOCS, manifest_path=MANIFEST, options=RenderOptions(), settings=BuildSettings()) -> list:
+    '''
+    Explains, from the manifest of the last incremental build, what an output was built from and why it was rebuilt
+    (or, for a source, which outputs were built from it), and whether it'd be rebuilt now
+
+    Inputs:
+        path: A path-string to an output (in the docs folder, or relative to it) or to a source file
+        basepath, options, settings: The settings the next build would use (see process_assets)
+        static, content, template_path, dest, manifest_path: Path-strings to the build's inputs, output folder and manifest
+
+    Outputs:
+        A list of lines to print, empty if the path isn't in the manifest
+    '''
+    manifest = Manifest(manifest_path, PROJECT)
+    absolute = os.path.abspath(path)
+    lines = []
+    if absolute.startswith(os.path.abspath(dest) + os.sep):
+        outputs = [os.path.relpath(absolute, dest)]
+    elif path in manifest.outputs:
+        outputs = [path]
     else:
-        # Gets the first item in the directory
-        item = dir_path_content[0]
-        # Uses regex to update the destination path
-        dest_dir_path = re.sub("/content/", "/docs/", str(item))
-        # Recurses on the item if the item is a directory
-        if pathlib.Path(item).is_dir():
-            contents = [i for i in pathlib.Path(item).iterdir()]
-            if not os.path.exists(dest_dir_path):
-                os.mkdir(dest_dir_path)
-            generate_pages_recursive(contents, TEMPLATE, dest_dir_path, basepath)
-        # Otherwise, copies the file over
+        # A source, so explains every output built from it
+        source = manifest.relative(absolute)
+        outputs = manifest.dependents(source)
+        lines.append(f"{source} is an input of {len(outputs)} output(s):")
+    outputs = [i for i in outputs if i in manifest.outputs]
+    if not outputs:
+        return []
+
+    plan = plan_outputs(static, content)
+    # Only looks at what the last build left in the caches, so explaining never optimizes images or writes anything
+    options = process_assets(plan, options, settings, read_only=True)
+    page_inputs = template_inputs(manifest, template_path, basepath)
+    for output in outputs:
+        lines.append(output)
+        lines.append("  built from: " + ", ".join(manifest.outputs[output]["inputs"]))
+        lines.append("  last rebuilt because: " + "; ".join(manifest.reasons.get(output, ["unknown (built before reasons were recorded)"])))
+        if output not in plan:
+            lines.append("  next build: removes it (its source is gone)")
+            continue
+        src_path, is_page = plan[output]
+        entry = output_entry(manifest, src_path, is_page, page_inputs, basepath, options)
+        reasons = manifest.stale_reasons(output, entry, os.path.exists(os.path.join(dest, output)))
+        lines.append("  next build: " + ("rebuilds it because " + "; ".join(reasons) if reasons else "up to date"))
+    return lines
+
+
+def build_incremental(basepath: str, static=STATIC, content=CONTENT, template_path=TEMPLATE, dest=DOCS, manifest_path=MANIFEST, cache=None, options=RenderOptions(), settings=BuildSettings()) -> None:
+    '''
+    Brings the docs folder up to date, only rebuilding outputs whose sources changed since the last build
+
+    Inputs:
+        basepath: The program's root directory
+        static, content, template_path, dest: Path-strings to the build's inputs and output folder
+        manifest_path: A path-string to the manifest recording what the last build used
+        cache: An optional PageCache to reuse previously rendered pages from
+        options: The RenderOptions to render pages with
+        settings: The BuildSettings to build with (checksum isn't used, changes are found through the manifest)
+
+    Outputs:
+        None
+    '''
+    manifest = Manifest(manifest_path, PROJECT)
+    with profiler.stage("discovery"):
+        plan = plan_outputs(static, content)
+    options = process_assets(plan, options, settings)
+
+    # Removes outputs whose sources have vanished since the last build
+    removed = [i for i in manifest.outputs if i not in plan]
+    for out_path in removed:
+        remove_output(dest, out_path)
+        manifest.forget(out_path)
+
+    page_inputs = template_inputs(manifest, template_path, basepath)
+    # Pages are rendered together at the end so they can be spread over worker processes
+    pages = []
+    entries = {}
+    # Assets are copied in the background while the pages render
+    copier = AssetCopier(settings.copy_jobs)
+    assets = []
+    for out_path, (src_path, is_page) in plan.items():
+        dest_path = os.path.join(dest, out_path)
+        entry = output_entry(manifest, src_path, is_page, page_inputs, basepath, options)
+        reasons = manifest.stale_reasons(out_path, entry, os.path.exists(dest_path))
+        if not reasons:
+            continue
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        if is_page:
+            pages.append((src_path, dest_path))
+            entries[dest_path] = (out_path, entry, reasons)
+            continue
+        assets.append((copier.submit(place_file, src_path, dest_path, settings.link), out_path, entry, reasons))
+
+    failures = []
+    try:
+        done = render_and_copy(pages, copier, template_path, basepath, cache=cache, options=options, settings=settings)
+    except BuildError as e:
+        failures = e.failures
+        failed = {path for path, _ in failures}
+        done = [i for i in pages if i[0] not in failed]
+    # Only records outputs that built, so failed ones are retried next time
+    for _, dest_path in done:
+        manifest.record(*entries[dest_path])
+    copied = [(out_path, entry, reasons) for future, out_path, entry, reasons in assets if not future.exception()]
+    for out_path, entry, reasons in copied:
+        manifest.record(out_path, entry, reasons)
+
+    manifest.prune_sources()
+    manifest.save()
+    print(f"Rebuilt {len(done) + len(copied)} of {len(plan)} outputs, removed {len(removed)}")
+    if failures:
+        raise BuildError(failures)
+
+
+def build_synced(basepath: str, static=STATIC, content=CONTENT, template_path=TEMPLATE, dest=DOCS, cache=None, options=RenderOptions(), settings=BuildSettings()) -> None:
+    '''
+    Builds the docs folder in place: assets are only copied when they differ from what's already there,
+    every page is rendered, and files with no source anymore are deleted
+
+    Inputs:
+        basepath: The program's root directory
+        static, content, template_path, dest: Path-strings to the build's inputs and output folder
+        cache: An optional PageCache to reuse previously rendered pages from
+        options: The RenderOptions to render pages with
+        settings: The BuildSettings to build with
+
+    Outputs:
+        None
+    '''
+    with profiler.stage("discovery"):
+        plan = plan_outputs(static, content)
+    options = process_assets(plan, options, settings)
+    # Keeps the precompressed variants of kept files (compress_tree deletes those that aren't wanted anymore)
+    expected = set(plan) | {out_path + i for out_path in plan for i in SUFFIXES.values()}
+    # The first build has no output folder to clean up yet
+    os.makedirs(dest, exist_ok=True)
+    removed = remove_stale(dest, expected)
+    pages = []
+    copier = AssetCopier(settings.copy_jobs)
+    assets = []
+    for out_path, (src_path, is_page) in plan.items():
+        dest_path = os.path.join(dest, out_path)
+        if is_page:
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            pages.append((src_path, dest_path))
+        else:
+            assets.append(copier.submit(sync_file, src_path, dest_path, settings.link, settings.checksum))
+    try:
+        render_and_copy(pages, copier, template_path, basepath, cache=cache, options=options, settings=settings)
+    finally:
+        copied = sum(1 for i in assets if not i.exception() and i.result())
+        print(f"Synced assets: {copied} updated, {len(assets) - copied} unchanged or failed, {removed} stale files removed")
+
+
+def build_full(basepath: str, static=STATIC, content=CONTENT, template_path=TEMPLATE, dest=DOCS, cache=None, options=RenderOptions(), settings=BuildSettings()) -> None:
+    '''
+    Rebuilds the docs folder from scratch, copying assets on a thread pool while the pages render
+
+    Inputs:
+        basepath: The program's root directory
+        static, content, template_path, dest: Path-strings to the build's inputs and output folder
+        cache: An optional PageCache to reuse previously rendered pages from
+        options: The RenderOptions to render pages with
+        settings: The BuildSettings to build with (link and checksum aren't used, since every asset is copied)
+
+    Outputs:
+        None
+    '''
+    # Removes the old build
+    if os.path.exists(dest):
+        rm_r(dest)
+    os.mkdir(dest)
+    pages = []
+    copier = AssetCopier(settings.copy_jobs)
+    with profiler.stage("discovery"):
+        plan = plan_outputs(static, content)
+    options = process_assets(plan, options, settings)
+    for out_path, (src_path, is_page) in plan.items():
+        dest_path = os.path.join(dest, out_path)
+        if is_page:
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            pages.append((src_path, dest_path))
         else:
-            # If the item is a markdown file, this generates the html page while copying
-            if item.suffix == ".md":
-                dest_dir_path = re.sub(".md$", ".html", dest_dir_path)
-                generate_page(item, TEMPLATE, dest_dir_path, basepath)
-            # Otherwise, just copies it over
-            else:
-                shutil.copy(item, dest_dir_path)
-    # Removes the finished item from the list and recurses
-    generate_pages_recursive(dir_path_content[1:], template_path, dest_dir_path, basepath)
+            # The folder is empty, so this always copies (creating parent folders as needed)
+            copier.submit(sync_file, src_path, dest_path)
+    render_and_copy(pages, copier, template_path, basepath, cache=cache, options=options, settings=settings)
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Builds the site in the docs folder from the content and static folders")
     # Sets the basepath to the first argument when this program is called
-    basepath = sys.argv[1] if len(sys.argv) > 1 else "/"
-    # Copies the static folder to the docs folder
-    copy_contents(STATIC, DOCS)
-    # Builds the path to the content folder
-    content = os.path.join(PROJECT, "content")
-    # Gets a list of the contents of the content folder
-    initial_contents = [i for i in pathlib.Path(content).iterdir()]
-    # Passes those contents to generate_pages_recursive to start it off
-    generate_pages_recursive(initial_contents, TEMPLATE, DOCS, basepath)
+    parser.add_argument("basepath", nargs="?", default="/", help="The root path the site is served from")
+    parser.add_argument("--incremental", action="store_true", help="Only rebuild outputs whose sources changed since the last build")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="The number of worker processes to render pages with")
+    parser.add_argument("--copy-jobs", type=int, default=4, help="The number of threads to copy assets with while pages render")
+    parser.add_argument("--cache-dir", help="A folder to keep rendered pages in and reuse them from across builds")
+    parser.add_argument("--cache-size", type=int, default=512, help="The size in MB the page cache is trimmed to after each build")
+    parser.add_argument("--sync", action="store_true", help="Update the docs folder in place, only copying assets that changed and deleting stale files")
+    parser.add_argument("--link", choices=LINK_MODES, default="copy", help="How --sync and --incremental put assets in the docs folder")
+    parser.add_argument("--checksum", action="store_true", help="Make --sync compare file contents when sizes match but mtimes don't")
+    parser.add_argument("--profile", nargs="?", const=os.path.join(CACHE, "profile.json"), metavar="PATH", help="Time each build stage per page and write a JSON report (default .cache/profile.json)")
+    parser.add_argument("--profile-top", type=int, default=10, help="How many of the slowest pages the profile report lists")
+    parser.add_argument("--mmap", action="store_true", help="Memory-map very large markdown files instead of reading them in chunks")
+    parser.add_argument("--async-io", action="store_true", help="Read and write pages on an asyncio pipeline while others render, hiding slow file I/O")
+    parser.add_argument("--inflight", type=int, default=16, help="How many pages --async-io keeps in flight at once")
+    parser.add_argument("--compress", nargs="*", choices=list(SUFFIXES), metavar="FORMAT", help="Write precompressed .gz (and .br, with the brotli module) copies of html, css and js (default: every available format)")
+    parser.add_argument("--compress-level", type=int, default=9, choices=range(1, 10), metavar="1-9", help="The zlib level for .gz files")
+    parser.add_argument("--minify", action="store_true", help="Collapse insignificant whitespace and optional syntax in the html (<pre> content is kept as is)")
+    parser.add_argument("--fingerprint", action="store_true", help="Copy css, js, images and fonts to content-hashed names (e.g. index.3f2a9c1b0d.css) and point pages and the template at them, so they can be cached forever")
+    parser.add_argument("--optimize-images", nargs="*", type=int, metavar="WIDTH", help=f"Re-encode png images and make resized copies at these widths for srcset (default: {' '.join(map(str, DEFAULT_WIDTHS))}), giving every img its width and height")
+    parser.add_argument("--image-sizes", action="store_true", help="Give every png img its width and height (read from the file's header) so pages don't shift as images load")
+    parser.add_argument("--lazy-images", nargs="?", type=int, const=1, metavar="N", help="Lazy-load (loading=lazy, decoding=async) every image after the first N on each page (default 1), and give images their sizes")
+    parser.add_argument("--explain", metavar="PATH", help="Show what an output (or source) was built from and why it was last rebuilt, then exit")
+    parser.add_argument("--watch", action="store_true", help="Serve the docs folder and rebuild (incrementally) whenever a source changes")
+    parser.add_argument("--port", type=int, default=8888, help="The port --watch serves the docs folder on")
+    args = parser.parse_args()
+    if args.jobs < 1 or args.copy_jobs < 1 or args.inflight < 1:
+        parser.error("--jobs, --copy-jobs and --inflight must be at least 1")
+    if args.optimize_images and min(args.optimize_images) < 1:
+        parser.error("--optimize-images widths must be at least 1")
+    if args.lazy_images is not None and args.lazy_images < 0:
+        parser.error("--lazy-images can't be negative")
+    if args.compress and "br" in args.compress and "br" not in available_formats():
+        parser.error("--compress br needs the brotli module")
+    if args.explain:
+        lines = explain(args.explain, args.basepath, **page_settings(args))
+        if not lines:
+            print(f"{args.explain} isn't in the manifest (run an --incremental build first)", file=sys.stderr)
+            sys.exit(1)
+        print("\n".join(lines))
+        return
+
+    try:
+        build(args)
+    except BuildError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+
+def page_settings(args) -> dict:
+    '''
+    Gets the settings every kind of build renders pages with from the parsed command line arguments
+
+    Outputs:
+        A dict of keyword arguments (the RenderOptions and BuildSettings) for build_incremental, build_synced,
+        build_full and explain
+    '''
+    settings = BuildSettings(
+        jobs=args.jobs,
+        copy_jobs=args.copy_jobs,
+        mapped=args.mmap,
+        inflight=args.inflight if args.async_io else 0,
+        link=args.link,
+        checksum=args.checksum,
+        fingerprint=args.fingerprint,
+        image_widths=(args.optimize_images or DEFAULT_WIDTHS) if args.optimize_images is not None else None,
+        # Lazy images without a size would make the page jump as they arrive
+        image_sizes=args.image_sizes or args.lazy_images is not None,
+    )
+    return {"options": RenderOptions(minify=args.minify, eager_images=args.lazy_images), "settings": settings}
+
+
+def build(args) -> None:
+    '''
+    Runs the build described by the parsed command line arguments
+    '''
+    cache = PageCache(args.cache_dir, args.cache_size * 1024 * 1024) if args.cache_dir else None
+    if args.profile:
+        profiler.active = profiler.Profiler()
+    # Without --compress every variant goes, since an earlier --compress build's would outlive the pages rewritten since
+    formats = (args.compress or available_formats()) if args.compress is not None else []
+    try:
+        if args.watch:
+            # Rebuilds in watch mode never compress, so old variants are cleared up front
+            if os.path.isdir(DOCS):
+                compress_tree(DOCS, [])
+            # Every rebuild in watch mode is incremental, in this same warm process
+            rebuild = lambda: build_incremental(args.basepath, cache=cache, **page_settings(args))
+            # Watches the template's partials too (those it includes when watching starts)
+            watched = [TEMPLATE, *load_template(TEMPLATE, args.basepath).includes]
+            watch.watch(rebuild, [CONTENT, STATIC], watched, DOCS, args.port)
+            return
+        build_site(args, cache)
+        written, removed = compress_tree(DOCS, formats, args.compress_level, args.copy_jobs)
+        if formats or removed:
+            print(f"Compressed {written} file(s), removed {removed} stale compressed file(s)")
+    finally:
+        # Trims the cache once per build rather than after every page
+        if cache:
+            cache.evict()
+        if args.profile:
+            # Block cache counters only cover pages rendered in this process (not in --jobs workers)
+            info = split_block.block_cache_info()
+            profiler.active.save(args.profile, args.profile_top, {"block_cache": {"hits": info.hits, "misses": info.misses}})
+
+
+def build_site(args, cache) -> None:
+    '''
+    Builds the docs folder, either incrementally, by syncing it in place or from scratch
+    '''
+    if args.incremental:
+        build_incremental(args.basepath, cache=cache, **page_settings(args))
+        return
+
+    # Neither an in-place sync nor a full rebuild keeps the manifest up to date
+    if os.path.exists(MANIFEST):
+        os.remove(MANIFEST)
+    if args.sync:
+        build_synced(args.basepath, cache=cache, **page_settings(args))
+        return
+    build_full(args.basepath, cache=cache, **page_settings(args))
 
 
 if __name__ == "__main__":
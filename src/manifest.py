@@ -0,0 +1,215 @@
+import hashlib, json, os
+
+# Bump this whenever the layout of the manifest file changes so old manifests are discarded
+MANIFEST_VERSION = 2
+
+
+def file_hash(path: str) -> str:
+    '''
+    Hashes the contents of a file
+
+    Inputs:
+        path: A path-string to the file you want to hash
+
+    Outputs:
+        A hex string of the file's sha256 digest
+    '''
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        # Reads in chunks so large assets don't have to fit in memory
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HashCache:
+    '''
+    File hashes persisted between builds and cached against each file's mtime and size, so unchanged files are
+    only stat-ed rather than re-read (the scheme Manifest.source_hash uses, for stages that run in every kind of build)
+    '''
+    def __init__(self, path: str):
+        self.path = path
+        # Path-strings mapped to [mtime_ns, size, digest]
+        self.hashes = {}
+        # The paths hashed this build, so files that are gone can be dropped on save
+        self.seen = set()
+        try:
+            with open(path, "r") as f:
+                self.hashes = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+
+    def hash(self, path: str) -> str:
+        '''
+        Gets the hash of a file, only re-reading it if its mtime or size changed
+
+        Inputs:
+            path: A path-string to the file
+
+        Outputs:
+            A hex string of the file's sha256 digest
+        '''
+        stat = os.stat(path)
+        self.seen.add(path)
+        cached = self.hashes.get(path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        digest = file_hash(path)
+        self.hashes[path] = [stat.st_mtime_ns, stat.st_size, digest]
+        return digest
+
+
+    def save(self) -> None:
+        '''
+        Writes the hashes of this build's files to disk, replacing the old ones atomically
+        '''
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({k: v for k, v in self.hashes.items() if k in self.seen}, f)
+        os.replace(tmp_path, self.path)
+
+
+class Manifest:
+    '''
+    A persisted record of which sources every output in the docs folder was built from (a dependency graph from
+    each output to every input it read), and of why each output was last rebuilt
+
+    Source hashes are cached against each file's mtime and size, so unchanged files are only
+    stat-ed on later builds rather than re-read.
+    '''
+    def __init__(self, path: str, root: str):
+        self.path = path
+        self.root = root
+        self.sources = {}
+        self.outputs = {}
+        # Outputs mapped to the list of reasons they were last rebuilt
+        self.reasons = {}
+        self.load()
+
+
+    def load(self) -> None:
+        '''
+        Reads the manifest from disk, starting empty if it's missing, unreadable or outdated
+        '''
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != MANIFEST_VERSION:
+            return
+        self.sources = data.get("sources", {})
+        self.outputs = data.get("outputs", {})
+        self.reasons = data.get("reasons", {})
+
+
+    def save(self) -> None:
+        '''
+        Writes the manifest to disk, replacing the old one atomically
+        '''
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "sources": self.sources, "outputs": self.outputs, "reasons": self.reasons}, f)
+        os.replace(tmp_path, self.path)
+
+
+    def relative(self, path: str) -> str:
+        '''
+        Turns a path into the key used for it in the manifest (relative to the project root)
+        '''
+        return os.path.relpath(path, self.root)
+
+
+    def source_hash(self, path: str) -> str:
+        '''
+        Gets the hash of a source file, only re-reading it if its mtime or size changed
+
+        Inputs:
+            path: A path-string to the source file
+
+        Outputs:
+            A hex string of the file's sha256 digest
+        '''
+        key = self.relative(path)
+        stat = os.stat(path)
+        cached = self.sources.get(key)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        digest = file_hash(path)
+        self.sources[key] = [stat.st_mtime_ns, stat.st_size, digest]
+        return digest
+
+
+    def stale_reasons(self, output: str, entry: dict, exists=True) -> list:
+        '''
+        Explains why an output needs rebuilding
+
+        Inputs:
+            output: The output's path relative to the docs folder
+            entry: A dict describing the inputs the output would be built from now
+            exists: Whether the output file is still in the docs folder
+
+        Outputs:
+            A list of reason strings, empty if the output is current
+        '''
+        recorded = self.outputs.get(output)
+        if recorded is None:
+            return ["new output"]
+        reasons = []
+        if not exists:
+            reasons.append("output missing")
+        old, new = recorded["inputs"], entry["inputs"]
+        for path in new:
+            if path not in old:
+                reasons.append(f"now depends on {path}")
+            elif old[path] != new[path]:
+                reasons.append(f"{path} changed")
+        reasons.extend(f"no longer depends on {path}" for path in old if path not in new)
+        # Everything else recorded (the basepath, render options...) must match too
+        for key in sorted(set(recorded) | set(entry)):
+            if key != "inputs" and recorded.get(key) != entry.get(key):
+                reasons.append(f"{key} changed from {recorded.get(key)} to {entry.get(key)}")
+        return reasons
+
+
+    def record(self, output: str, entry: dict, reasons=None) -> None:
+        '''
+        Stores the inputs an output was just built from, and optionally why it was built
+        '''
+        self.outputs[output] = entry
+        if reasons is not None:
+            self.reasons[output] = reasons
+
+
+    def dependents(self, source: str) -> list:
+        '''
+        Finds every output built from a source
+
+        Inputs:
+            source: The source's path relative to the project root
+
+        Outputs:
+            A sorted list of output paths relative to the docs folder
+        '''
+        return sorted(output for output, entry in self.outputs.items() if source in entry["inputs"])
+
+
+    def forget(self, output: str) -> None:
+        '''
+        Drops an output from the manifest
+        '''
+        self.outputs.pop(output, None)
+        self.reasons.pop(output, None)
+
+
+    def prune_sources(self) -> None:
+        '''
+        Drops cached hashes for sources that no recorded output depends on anymore
+        '''
+        used = set()
+        for entry in self.outputs.values():
+            used.update(entry["inputs"].keys())
+        self.sources = {k: v for k, v in self.sources.items() if k in used}
@@ -0,0 +1,91 @@
+'''
+Settings threaded from the command line through the build: those that change the html a page renders to
+(RenderOptions) and those that change how the build runs (BuildSettings)
+'''
+import hashlib, json
+from typing import NamedTuple
+
+
+class FrozenMap:
+    '''
+    A read-only mapping that's hashable by its contents, so build-wide lookup tables (fingerprinted asset names, image
+    sizes...) can be part of RenderOptions, and so of the block memo and page cache keys, without hashing every entry
+    each time
+    '''
+    def __init__(self, mapping: dict):
+        self.mapping = mapping
+        self.digest = hashlib.sha256(json.dumps(sorted(mapping.items())).encode()).hexdigest()
+
+
+    def get(self, key, default=None):
+        return self.mapping.get(key, default)
+
+
+    def __len__(self):
+        return len(self.mapping)
+
+
+    def __hash__(self):
+        return hash(self.digest)
+
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self.digest == other.digest
+
+
+    def __repr__(self):
+        # Stands in for the whole map in page cache keys
+        return f"{type(self).__name__}({self.digest})"
+
+
+class RenderOptions(NamedTuple):
+    '''
+    Rendering settings threaded from the command line down to the serializer
+
+    Being a tuple, it's hashable (so it can be part of the block cache's key) and picklable (so it can be sent to
+    worker processes). Every field changes the html, so the whole thing is part of page cache keys and manifest entries.
+    '''
+    # Collapses the template's whitespace, leaves off optional attribute quotes and drops closing tags on void
+    # elements like <img>
+    minify: bool = False
+    # An AssetMap pointing site-relative links and image urls at the assets' fingerprinted names (see fingerprint.py)
+    assets: FrozenMap = None
+    # An ImageMap giving images their sizes and resized copies (see images.py)
+    images: FrozenMap = None
+    # Gives every image after the first this many on a page loading="lazy" and decoding="async", so only images
+    # above the fold load straight away (None leaves loading to the browser)
+    eager_images: int = None
+
+
+    def summary(self) -> dict:
+        '''
+        Gets the options as plain values for the manifest (a map is summed up by its digest)
+        '''
+        return {k: getattr(v, "digest", v) for k, v in self._asdict().items()}
+
+
+class BuildSettings(NamedTuple):
+    '''
+    Build-wide settings that decide how the docs folder is produced rather than the html in it (though the asset
+    stages they turn on hand their results to pages through RenderOptions, see main.process_assets)
+
+    Being a tuple, it's picklable, so it can be sent to worker processes as one argument.
+    '''
+    # The number of worker processes to render pages (and optimize images) with
+    jobs: int = 1
+    # The number of threads to copy assets with while pages render
+    copy_jobs: int = 1
+    # Memory-maps very large markdown files rather than reading them in chunks
+    mapped: bool = False
+    # How many pages the asyncio pipeline keeps in flight at once (0 renders without it)
+    inflight: int = 0
+    # How --sync and --incremental put assets in the docs folder (see sync.place_file)
+    link: str = "copy"
+    # Makes --sync compare asset contents when sizes match but mtimes don't
+    checksum: bool = False
+    # Also copies assets to content-hashed names and points pages and the template at them
+    fingerprint: bool = False
+    # The widths to make resized copies of pngs at (None copies images as they are)
+    image_widths: tuple = None
+    # Gives images their width and height (read from their headers) without optimizing them
+    image_sizes: bool = False
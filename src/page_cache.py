@@ -0,0 +1,121 @@
+import hashlib, os, shutil
+from config import RENDERER_VERSION
+from options import RenderOptions
+
+
+class PageCache:
+    '''
+    A folder of rendered pages keyed by everything that decides a page's html: the markdown, the template,
+    the basepath, the render options and the renderer version
+
+    The cache can be shared between builds (and machines). Reading an entry marks it as recently used, and
+    evict() deletes the least recently used entries once the folder grows past its size limit.
+    '''
+    def __init__(self, folder: str, max_bytes=512 * 1024 * 1024):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        os.makedirs(folder, exist_ok=True)
+
+
+    def key(self, markdown: str, template_digest: str, basepath: str, options=RenderOptions()) -> str:
+        '''
+        Builds the cache key for a page
+
+        Inputs:
+            markdown: The page's markdown
+            template_digest: The hash of the template the page is rendered into
+            basepath: The program's root directory
+            options: The RenderOptions the page is rendered with
+
+        Outputs:
+            A hex string naming the cache entry
+        '''
+        return self.digest_key(hashlib.sha256(markdown.encode()).hexdigest(), template_digest, basepath, options)
+
+
+    def digest_key(self, markdown_digest: str, template_digest: str, basepath: str, options=RenderOptions()) -> str:
+        '''
+        Builds the cache key for a page whose markdown has already been hashed (e.g. a chunk at a time)
+
+        Inputs:
+            markdown_digest: The sha256 hex digest of the page's markdown, encoded as utf-8
+            template_digest, basepath, options: See key
+
+        Outputs:
+            A hex string naming the cache entry
+        '''
+        parts = [str(RENDERER_VERSION), markdown_digest, template_digest, basepath, repr(tuple(options))]
+        return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+    def path(self, key: str) -> str:
+        # Shards entries into subfolders so a big cache doesn't put every file in one folder
+        return os.path.join(self.folder, key[:2], key + ".html")
+
+
+    def get(self, key: str, dest_path: str) -> bool:
+        '''
+        Copies a cached page to its destination if there is one
+
+        Inputs:
+            key: The page's cache key
+            dest_path: A path-string to the file to write
+
+        Outputs:
+            True if the page was in the cache, False otherwise
+        '''
+        path = self.path(key)
+        try:
+            shutil.copyfile(path, dest_path)
+            # Bumps the entry's mtime, which eviction uses as its last-used time
+            os.utime(path)
+        except FileNotFoundError:
+            # Missing, or evicted by another build in the meantime
+            return False
+        return True
+
+
+    def put(self, key: str, src_path: str) -> None:
+        '''
+        Stores a rendered page in the cache
+
+        Inputs:
+            key: The page's cache key
+            src_path: A path-string to the rendered page
+        '''
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Writes to a temporary name first so other processes never see half a page
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, path)
+
+
+    def evict(self) -> int:
+        '''
+        Deletes the least recently used entries until the cache fits in its size limit
+
+        Outputs:
+            The number of entries deleted
+        '''
+        entries = []
+        total = 0
+        for shard in os.scandir(self.folder):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+        removed = 0
+        # Oldest first
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
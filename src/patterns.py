@@ -0,0 +1,63 @@
+'''
+Precompiled regular expressions shared by the block and inline parsers
+
+Compiling once at import means parsing functions don't pay for re's pattern cache lookup (or for building
+the pattern string) on every call.
+'''
+import re
+from functools import lru_cache
+
+# Block level patterns (see split_block.py)
+HEADING_PREFIX = re.compile(r"^#{1,6} ")
+QUOTE_LINE = re.compile(r"^>")
+UNORDERED_LINE = re.compile(r"^- ")
+ORDERED_LINE = re.compile(r"^[0-9]*. ")
+
+# Template slot pattern (see template.py), e.g. {{ Title }}
+TEMPLATE_SLOT = re.compile(r"{{ (\w+) }}")
+# Minification patterns (see template.minify_html and HTMLNode.props_to_html)
+# Elements whose whitespace matters, split out whole so minifying leaves them alone
+MINIFY_PRESERVE = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.DOTALL | re.IGNORECASE)
+# Whitespace between two tags that spans a line break (indentation, not content)
+MINIFY_BETWEEN_TAGS = re.compile(r">\s*\n\s*<")
+WHITESPACE_RUN = re.compile(r"\s+")
+UNQUOTED_ATTRIBUTE = re.compile(r"[^\s\"'=<>`]+")
+# A site-relative url in a template's href or src attribute, e.g. href="/index.css" (see Template)
+TEMPLATE_URL = re.compile(r'((?:href|src)=")(/[^"]*)')
+# Template include pattern, e.g. {{ include partials/nav.html }}
+TEMPLATE_INCLUDE = re.compile(r"{{ include ([^\s}]+) }}")
+
+# Inline patterns (see splitter_funcs.py)
+# The grouped versions extract (text, url) pairs, the bare versions match the whole element
+IMAGE = re.compile(r"!\[([^\]]*)\]\(([^\)]*)\)")
+IMAGE_MARKUP = re.compile(r"!\[[^\]]*\]\([^\)]*\)")
+LINK = re.compile(r"(?<!!)\[([^\]]*)\]\(([^\)]*)\)")
+LINK_MARKUP = re.compile(r"(?<!!)\[[^\]]*\]\([^\)]*\)")
+
+# Matches images and links, which are split out of a line before anything else (the order the split_nodes_*
+# functions used to run in), so underscores or asterisks in their text and urls never start emphasis
+INLINE_MEDIA = re.compile(
+    r"!\[(?P<image_alt>[^\]]*)\]\((?P<image_url>[^\)]*)\)"
+    r"|\[(?P<link_text>[^\]]*)\]\((?P<link_url>[^\)]*)\)"
+)
+# Matches bold, italic and code spans in the text between images and links; where two could start at the same
+# place the earlier alternative wins
+INLINE_EMPHASIS = re.compile(
+    r"\*\*(?P<bold>[^*]*)\*\*"
+    r"|_(?P<italic>[^_]*)_"
+    r"|`(?P<code>[^`]*)`"
+)
+
+
+@lru_cache(maxsize=None)
+def delimiter_patterns(delimiter: str) -> tuple:
+    '''
+    Builds the patterns split_nodes_delimiter needs for a delimiter, once per delimiter
+
+    Inputs:
+        delimiter: A regex string for the delimiter (e.g. "\\*\\*" for **)
+
+    Outputs:
+        A tuple of the compiled span pattern (delimiter, text, delimiter) and the delimiter itself
+    '''
+    return re.compile(f"{delimiter}[^{delimiter}]*{delimiter}"), re.compile(delimiter)
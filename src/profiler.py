@@ -0,0 +1,162 @@
+'''
+Per-stage build timings, recorded per page and for the build as a whole
+
+Profiling is off unless a Profiler is made active, in which case code wrapped in stage() is timed:
+    with profiler.stage("write"):
+        ...
+Stage times are exclusive, so time spent in a nested stage (e.g. inline parsing inside block splitting) only
+counts towards the innermost one.
+'''
+import json, os, threading, time
+from contextlib import contextmanager, nullcontext
+
+# The profiler recording the current build, or None when profiling is off
+active = None
+
+# Handed out when profiling is off, so timed code costs next to nothing
+_NULL = nullcontext()
+
+
+def stage(name: str):
+    '''
+    Times the code in a with block as a named stage, if profiling is on
+
+    Inputs:
+        name: The stage's name, e.g. "inline parsing"
+
+    Outputs:
+        A context manager
+    '''
+    if active is None:
+        return _NULL
+    return active.stage(name)
+
+
+def page(path: str):
+    '''
+    Records the stages timed inside a with block against a page, if profiling is on
+
+    Inputs:
+        path: A path-string to the page's markdown file
+
+    Outputs:
+        A context manager
+    '''
+    if active is None:
+        return _NULL
+    return active.page(path)
+
+
+class Profiler:
+    '''
+    Collects stage timings for one build
+    '''
+    def __init__(self):
+        self.start = time.perf_counter()
+        # Stages that don't belong to a page (discovery, static copy...), in seconds
+        self.build = {}
+        # Page path-strings mapped to dicts of stage timings (plus their "total")
+        self.pages = {}
+        # Each thread keeps its own stack of running stages and its own current page
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+
+    @contextmanager
+    def stage(self, name: str):
+        # Each frame on the stack holds the time spent in stages nested inside it
+        frames = self.local.__dict__.setdefault("frames", [])
+        frames.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            exclusive = elapsed - frames.pop()
+            if frames:
+                frames[-1] += elapsed
+            record = getattr(self.local, "record", None)
+            if record is None:
+                self.add(name, exclusive)
+            else:
+                record[name] = record.get(name, 0.0) + exclusive
+
+
+    @contextmanager
+    def page(self, path: str):
+        record = {}
+        self.local.record = record
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["total"] = time.perf_counter() - start
+            self.local.record = None
+            self.add_page(path, record)
+
+
+    def add(self, name: str, seconds: float) -> None:
+        '''
+        Adds time to a build-wide stage (safe to call from any thread)
+        '''
+        with self.lock:
+            self.build[name] = self.build.get(name, 0.0) + seconds
+
+
+    def add_page(self, path: str, record: dict) -> None:
+        '''
+        Stores a page's stage timings, e.g. ones recorded in a worker process
+        '''
+        with self.lock:
+            self.pages[str(path)] = record
+
+
+    def report(self, top=10, extra=None) -> dict:
+        '''
+        Summarizes the build's timings
+
+        Inputs:
+            top: How many of the slowest pages to list
+            extra: An optional dict of other figures to include (e.g. cache counters)
+
+        Outputs:
+            A dict ready to be written as JSON
+        '''
+        stages = {}
+        for record in self.pages.values():
+            for name, seconds in record.items():
+                if name != "total":
+                    stages[name] = stages.get(name, 0.0) + seconds
+        slowest = sorted(self.pages.items(), key=lambda i: i[1]["total"], reverse=True)[:top]
+        return {
+            "wall_time": time.perf_counter() - self.start,
+            "pages_built": len(self.pages),
+            # Asset copies run on several threads, so "static copy" is thread time rather than wall time
+            "build_stages": self.build,
+            "page_stages": stages,
+            "slowest_pages": [{"path": path, **record} for path, record in slowest],
+            "pages": self.pages,
+            **(extra or {}),
+        }
+
+
+    def save(self, path: str, top=10, extra=None) -> dict:
+        '''
+        Writes the report to a JSON file and prints a short summary
+
+        Outputs:
+            The report
+        '''
+        report = self.report(top, extra)
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Profile written to {path} ({report['pages_built']} pages in {report['wall_time']:.3f}s)")
+        for name, seconds in list(report["build_stages"].items()) + list(report["page_stages"].items()):
+            print(f"  {name:<20}{seconds * 1000:10.1f} ms")
+        print(f"Slowest {len(report['slowest_pages'])} pages:")
+        for record in report["slowest_pages"]:
+            print(f"  {record['total'] * 1000:10.1f} ms  {record['path']}")
+        return report
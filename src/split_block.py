@@ -1,9 +1,14 @@
 from block import BlockType
-import re
-import math
+import patterns
+from functools import lru_cache
+import profiler
 from htmlnode import HTMLNode, ParentNode, LeafNode
 from splitter_funcs import text_node_to_html_node, text_to_text_nodes
 from config import PROJECT, PUBLIC, STATIC
+from options import RenderOptions
+
+# How many distinct blocks render_block remembers the html of
+BLOCK_CACHE_SIZE = 8192
 
 def markdown_to_blocks(markdown: str) -> list:
     '''
@@ -15,112 +20,271 @@ def markdown_to_blocks(markdown: str) -> list:
     Outputs:
         Each chunk of text divided by two new lines, with spaces removed
     '''
-    markdown_blocks = markdown.split("\n\n")
-    for i in range(0, len(markdown_blocks)):
-        markdown_blocks[i] = markdown_blocks[i].strip()
-    return [i for i in markdown_blocks if i != ""]
+    return [block for block, _ in scan_blocks(markdown)]
 
 
-def block_to_block_type(block: str) -> BlockType:
+def is_ordered_line(line: str) -> bool:
+    '''
+    Checks a line against patterns.ORDERED_LINE (any digits, then any character, then a space) without regex
+
+    The pattern's "." isn't escaped, so "1. a", "1) a" and even "12 a" (two digits, then "2" standing in for the
+    dot) all count as list items. The space can be anywhere from the second character to the one after the digits.
     '''
-    Gets the type of the input block using regular expressions
+    digits = len(line) - len(line.lstrip("0123456789"))
+    return " " in line[1:digits + 2]
+
+
+def classify_block(block: str) -> BlockType:
+    '''
+    Gets the type of a block in a single pass over its lines, stopping as soon as no line-based type can match
 
     Inputs:
-        block: A string of markdown text received from markdown_to_blocks
+        block: A stripped block of markdown text
 
-    Returns:
-        A BlockType enum instance representing the type of block the input text matches
+    Outputs:
+        A BlockType enum instance
     '''
-    if len(re.findall("^#{1,6} .*", block)) > 0:
+    # A heading is one to six #s, then a space
+    hashes = len(block) - len(block.lstrip("#"))
+    if 1 <= hashes <= 6 and block[hashes:hashes + 1] == " ":
         return BlockType.HEADING
-    elif len(re.findall("^`{3}[^`]*`{3}$", block)) > 0:
+    # A code block has three backticks at each end and none in between
+    if len(block) >= 6 and block.startswith("```") and block.endswith("```") and "`" not in block[3:-3]:
         return BlockType.CODE
 
-    lines = block.split("\n")
-    quote_pattern = "^>"
-    ul_pattern = "^- "
-    ol_pattern = "^[0-9]*. "
+    # Every line has to fit for a block to be a quote or list, so each line can only rule types out.
+    # Paragraphs are usually ruled out of all three on their first line, before the rest is even split.
+    first, _, rest = block.partition("\n")
+    quote = first.startswith(">")
+    unordered = first.startswith("- ")
+    ordered = is_ordered_line(first)
+    if rest:
+        for line in rest.split("\n"):
+            if not (quote or unordered or ordered):
+                break
+            quote = quote and line.startswith(">")
+            unordered = unordered and line.startswith("- ")
+            ordered = ordered and is_ordered_line(line)
 
-    # Uses boolean multiplication to see if there are any lines that break the pattern and therefore disqualify the block for its blocktypes
-    if math.prod([re.search(quote_pattern, i) != None for i in lines]):
+    # Checked in the same order as before, since a block can fit more than one (e.g. "- a" is an ordered line too)
+    if quote:
         return BlockType.QUOTE
-    elif math.prod([re.search(ul_pattern, i) != None for i in lines]):
+    elif unordered:
         return BlockType.UNORDERED_LIST
-    elif math.prod([re.match(ol_pattern, i) != None for i in lines]):
+    elif ordered:
         return BlockType.ORDERED_LIST
-    else:
-        return BlockType.PARAGRAPH
+    return BlockType.PARAGRAPH
 
 
-def line_to_children(line: str) -> list:
+def scan_blocks(markdown: str) -> list:
+    '''
+    Splits a markdown document into blocks and classifies each one as it goes
+
+    Inputs:
+        markdown: A string of a full markdown document
+
+    Outputs:
+        A list of (block, BlockType) tuples, with each block stripped and empty ones skipped
+    '''
+    out = []
+    for block in markdown.split("\n\n"):
+        block = block.strip()
+        if block:
+            out.append((block, classify_block(block)))
+    return out
+
+
+def block_to_block_type(block: str) -> BlockType:
+    '''
+    Gets the type of the input block
+
+    Inputs:
+        block: A string of markdown text received from markdown_to_blocks
+
+    Returns:
+        A BlockType enum instance representing the type of block the input text matches
+    '''
+    return classify_block(block)
+
+
+def line_to_children(line: str, basepath="/", options=RenderOptions()) -> list:
     '''
     Splits an input string into a list of HTMLNode objects by first splitting them into TextNodes
 
     Inputs:
         line: A line of markdown text
+        basepath: The root directory site-relative urls are resolved against
+        options: The RenderOptions to render with
 
     Outputs:
         A list of HTMLNode objects
     '''
-    out = [text_node_to_html_node(i) for i in text_to_text_nodes(line)]
+    with profiler.stage("inline parsing"):
+        out = [text_node_to_html_node(i, basepath, options) for i in text_to_text_nodes(line)]
     return out
 
 
-def markdown_to_html_node(markdown: str) -> ParentNode:
+def block_to_html_nodes(block: str, basepath="/", block_type=None, options=RenderOptions()) -> list:
+    '''
+    Turns a single block of markdown into the HTMLNode objects it represents
+
+    Inputs:
+        block: A string of markdown text received from markdown_to_blocks
+        basepath: The root directory site-relative link and image urls are resolved against
+        block_type: The block's BlockType if it's already known (e.g. from scan_blocks)
+        options: The RenderOptions to render with
+
+    Outputs:
+        A list of HTMLNode objects (headings spanning several lines become one node per line)
+    '''
+    match block_type or block_to_block_type(block):
+        # Each BlockType removes the type indicators used in markdown when transforming to HTMLNode
+        case BlockType.CODE:
+            return [ParentNode("pre", [LeafNode(tag="code", value=block[4:-4])])]
+        case BlockType.HEADING:
+            # First extracts the level of the heading using regex to display properly in html
+            heading_level = len(patterns.HEADING_PREFIX.match(block)[0][:-1])
+            lines = [patterns.HEADING_PREFIX.sub("", i) for i in block.split("\n")]
+            return [ParentNode(f"h{heading_level}", line_to_children(line, basepath, options)) for line in lines]
+        case BlockType.UNORDERED_LIST:
+            lines = [patterns.UNORDERED_LINE.sub("", i) for i in block.split("\n")]
+            node = ParentNode("ul", [])
+            for line in lines:
+                node.children.append(ParentNode("li", line_to_children(line, basepath, options)))
+            return [node]
+        case BlockType.ORDERED_LIST:
+            lines = [patterns.ORDERED_LINE.sub("", i) for i in block.split("\n")]
+            node = ParentNode("ol", [])
+            for line in lines:
+                node.children.append(ParentNode("li", line_to_children(line, basepath, options)))
+            return [node]
+        case BlockType.QUOTE:
+            lines = [patterns.QUOTE_LINE.sub("", i) for i in block.split("\n")]
+            lines = [i.strip() for i in lines]
+            node = ParentNode("blockquote", [])
+            for line in lines:
+                node.children.extend(line_to_children(line, basepath, options))
+                node.children.extend([LeafNode(value="<br>")])
+            return [node]
+        case BlockType.PARAGRAPH:
+            line = " ".join(block.split("\n"))
+            node = ParentNode("p", [])
+            node.children.extend(line_to_children(line, basepath, options))
+            return [node]
+
+
+def block_html(block: str, basepath: str, block_type=None, options=RenderOptions()) -> tuple:
+    '''
+    Renders a block of markdown to html, marking images past the first options.eager_images as lazy
+
+    Inputs:
+        block: A string of markdown text received from markdown_to_blocks
+        basepath: The root directory site-relative link and image urls are resolved against
+        block_type: The block's BlockType if it's already known
+        options: The RenderOptions to render with
+
+    Outputs:
+        A tuple of the html string and the number of images in the block
+    '''
+    # The block's type is decided by its text, so including it in the key never splits a block's entries
+    nodes = block_to_html_nodes(block, basepath, block_type, options)
+    images = mark_lazy_images(nodes, options.eager_images)
+    with profiler.stage("html serialization"):
+        return ''.join(node.to_html(options.minify) for node in nodes), images
+
+
+@lru_cache(maxsize=BLOCK_CACHE_SIZE)
+def render_block(block: str, basepath: str, block_type=None, options=RenderOptions()) -> tuple:
+    '''
+    Renders a block of markdown (see block_html), remembering the result so identical blocks (shared notices,
+    footers, license text...) are only parsed once per build
+    '''
+    return block_html(block, basepath, block_type, options)
+
+
+def mark_lazy_images(nodes: list, eager=None) -> int:
+    '''
+    Sets every image in a block's nodes after the first few to load lazily
+
+    Inputs:
+        nodes: A list of HTMLNode objects, changed in place
+        eager: How many of the images (in page order) to leave loading straight away, or None to only count them
+
+    Outputs:
+        The number of images in the nodes
+    '''
+    stack = list(reversed(nodes))
+    seen = 0
+    while stack:
+        node = stack.pop()
+        if node.tag == "img":
+            if eager is not None and seen >= eager:
+                node.props["loading"] = "lazy"
+                node.props["decoding"] = "async"
+            seen += 1
+        elif node.children:
+            stack.extend(reversed(node.children))
+    return seen
+
+
+def render_blocks(blocks, basepath="/", options=RenderOptions(), cached=True):
+    '''
+    Renders classified blocks in page order (see render_block), counting down the images still to load eagerly so
+    that only those below the fold are lazy
+
+    Inputs:
+        blocks: An iterable of (block, BlockType) tuples, e.g. from scan_blocks
+        basepath: The root directory site-relative link and image urls are resolved against
+        options: The RenderOptions to render with
+        cached: Whether to go through the block cache (streamed pages don't, so only one block's html is held)
+
+    Outputs:
+        A generator of each block's html
+    '''
+    render = render_block if cached else block_html
+    eager = options.eager_images
+    for block, block_type in blocks:
+        if eager is None:
+            yield render(block, basepath, block_type, options)[0]
+            continue
+        # Blocks past the fold all share eager_images=0, so they still share memo entries
+        html, images = render(block, basepath, block_type, options._replace(eager_images=eager))
+        eager = max(0, eager - images)
+        yield html
+
+
+def block_cache_info():
+    '''
+    Gets the hit and miss counts of the rendered block cache (shared by every page rendered in this process)
+
+    Outputs:
+        A functools cache info tuple of (hits, misses, maxsize, currsize)
+    '''
+    return render_block.cache_info()
+
+
+def clear_block_cache() -> None:
+    '''
+    Empties the rendered block cache and resets its counters
+    '''
+    render_block.cache_clear()
+
+
+def markdown_to_html_node(markdown: str, basepath="/", options=RenderOptions()) -> ParentNode:
     '''
     Takes in a whole markdown document as a string and returns a single HTMLNode object containing everything extracted from the input text
 
     Inputs:
         markdown: A string containing a whole markdown document
+        basepath: The root directory site-relative link and image urls are resolved against
+        options: The RenderOptions to render with
 
     Outputs:
-        An HTMLNode object (ParentNode, really) with child-nodes representing all special text contained within
-    '''
-    #TODO: Simplify this, there's a lot of redundant logic in this
-
-    # Gets the blocks
-    blocks = markdown_to_blocks(markdown)
-    # Initializes the output node as a div with an empty list of children
-    main_node = ParentNode("div", [])
-    # Adds the HTMLNodes made from the blocks into the main node's child list based on their BlockTypes
-    for block in blocks:
-        match block_to_block_type(block):
-            # Each BlockType removes the type indicators used in markdown when transforming to HTMLNode
-            case BlockType.CODE:
-                main_node.children.append(ParentNode("pre", [LeafNode(tag="code", value=block[4:-4])]))
-                continue
-            case BlockType.HEADING:
-                # First extracts the level of the heading using regex to display properly in html
-                heading_level = len(re.match("^#{1,6} ", block)[0][:-1])
-                lines = [re.sub("^#{1,6} ", "", i) for i in block.split("\n")]
-                for line in lines:
-                    main_node.children.append(ParentNode(f"h{heading_level}", line_to_children(line)))
-                continue
-            case BlockType.UNORDERED_LIST:
-                lines = [re.sub("^- ", "", i) for i in block.split("\n")]
-                node = ParentNode("ul", [])
-                for line in lines:
-                    node.children.append(ParentNode("li", line_to_children(line)))
-                main_node.children.append(node)
-                continue
-            case BlockType.ORDERED_LIST:
-                lines = [re.sub("^[0-9]*. ", "", i) for i in block.split("\n")]
-                node = ParentNode("ol", [])
-                for line in lines:
-                    node.children.append(ParentNode("li", line_to_children(line)))
-                main_node.children.append(node)
-                continue
-            case BlockType.QUOTE:
-                lines = [re.sub("^>", "", i) for i in block.split("\n")]
-                lines = [i.strip() for i in lines]
-                node = ParentNode("blockquote", [])
-                for line in lines:
-                    node.children.extend(line_to_children(line))
-                    node.children.extend([LeafNode(value="<br>")])
-                main_node.children.append(node)
-            case BlockType.PARAGRAPH:
-                line = " ".join(block.split("\n"))
-                node = ParentNode("p", [])
-                node.children.extend(line_to_children(line))
-                main_node.children.append(node)
-    return main_node
+        An HTMLNode object (ParentNode, really) with a child holding the html of each block
+    '''
+    # Classifying blocks counts as block splitting, parsing their text and writing their html are timed separately
+    with profiler.stage("block splitting"):
+        # Gets the blocks, already classified
+        blocks = scan_blocks(markdown)
+        # Initializes the output node as a div, with each block's (possibly remembered) html as a raw text child
+        return ParentNode("div", [LeafNode(value=html) for html in render_blocks(blocks, basepath, options)])
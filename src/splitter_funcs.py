@@ -1,14 +1,59 @@
 from textnode import TextNode, TextType
 from htmlnode import HTMLNode, LeafNode, ParentNode
-import re
+from options import RenderOptions
+import patterns
 
+def resolve_url(url: str, basepath: str, assets=None) -> str:
+    '''
+    Points a site-relative url (one starting with "/") at the basepath the site is deployed under
+
+    Inputs:
+        url: A url from a link or image
+        basepath: The program's root directory
+        assets: An optional AssetMap to swap asset urls for their fingerprinted ones
+
+    Outputs:
+        The url to put in the html
+    '''
+    if url.startswith("/"):
+        if assets:
+            url = assets.get(url, url)
+        return basepath + url[1:]
+    return url
 
-def text_node_to_html_node(text_node: TextNode) -> LeafNode:
+
+def image_props(text_node: TextNode, basepath: str, options: RenderOptions) -> dict:
+    '''
+    Builds an image's attributes, adding its size (so the page doesn't shift as it loads) and its resized copies
+    when the build optimized it
+
+    Inputs:
+        text_node: An IMAGE TextNode
+        basepath: The root directory site-relative urls are resolved against
+        options: The RenderOptions to render with
+
+    Outputs:
+        A dict of the img tag's attributes
+    '''
+    props = {"src": resolve_url(text_node.url, basepath, options.assets), "alt": text_node.text}
+    image = options.images.get(text_node.url) if options.images else None
+    if image:
+        width, height, srcset = image
+        if srcset:
+            props["srcset"] = ", ".join(f"{resolve_url(url, basepath, options.assets)} {w}w" for url, w in srcset)
+        props["width"] = str(width)
+        props["height"] = str(height)
+    return props
+
+
+def text_node_to_html_node(text_node: TextNode, basepath="/", options=RenderOptions()) -> LeafNode:
     '''
     Turns a TextNode object into an HTMLNode object
 
     Inputs:
         text_node: A TextNode object
+        basepath: The root directory site-relative link and image urls are resolved against
+        options: The RenderOptions to render with (for fingerprinted asset urls and image sizes)
 
     Outputs:
         An HTMLNode object with the appropriate tag
@@ -24,9 +69,9 @@ def text_node_to_html_node(text_node: TextNode) -> LeafNode:
         case TextType.CODE:
             return LeafNode(tag="code", value=text_node.text)
         case TextType.LINK:
-            return LeafNode(tag="a", value=text_node.text, props={"href":text_node.url})
+            return LeafNode(tag="a", value=text_node.text, props={"href":resolve_url(text_node.url, basepath, options.assets)})
         case TextType.IMAGE:
-            return LeafNode(tag="img", props={"src":text_node.url, "alt":text_node.text})
+            return LeafNode(tag="img", props=image_props(text_node, basepath, options))
         case _:
             raise TypeError()
 
@@ -46,8 +91,8 @@ def split_nodes_delimiter(old_nodes: list, delimiter: str, text_type: TextType)
     new_nodes = []
     # A boolean that indicates whether the next node is special in order to alternate properly
     next_special = False
-    # A regex built using the delimiter
-    search_term = f"{delimiter}[^{delimiter}]*{delimiter}"
+    # Regexes built using the delimiter (compiled once per delimiter)
+    search_term, delimiter_term = patterns.delimiter_patterns(delimiter)
     # Loops through the old nodes
     for node in old_nodes:
         # It's hard to handle nested nodes, so this skips anything that isn't vanilla text
@@ -55,19 +100,19 @@ def split_nodes_delimiter(old_nodes: list, delimiter: str, text_type: TextType)
             new_nodes.append(node)
             continue
         # Gathers the portions of the text that match the regex
-        matches = re.findall(search_term, node.text)
+        matches = search_term.findall(node.text)
         # If there is no match, this adds the node back to the list as a regular text node
         if len(matches) == 0:
             new_nodes.append(node)
             continue
         # Captures the text that isn't a match and adds a delimiter that's unlikely to appear naturally
-        remaining_text = re.sub(search_term, "|;&", node.text)
+        remaining_text = search_term.sub("|;&", node.text)
         match_num = 0
         # Splits the text by the new delimiter and enumerates through the segments
         for i, term in enumerate(remaining_text.split("|;&")):
             # If it starts with a blank, we know a match was there, so we start the alternation here
             if i == 0 and term == "":
-                new_nodes.append(TextNode(re.sub(delimiter, "", matches[match_num]), text_type))
+                new_nodes.append(TextNode(delimiter_term.sub("", matches[match_num]), text_type))
                 match_num += 1
             else:
                 # Since the alternating pattern takes care of the remaining matches, we can safely ignore blanks that aren't at the beginning
@@ -77,7 +122,7 @@ def split_nodes_delimiter(old_nodes: list, delimiter: str, text_type: TextType)
                 new_nodes.append(TextNode(term, TextType.TEXT))
                 # If there are remaining matches, they get added to the output list
                 if match_num < len(matches):
-                    new_nodes.append(TextNode(re.sub(delimiter, "", matches[match_num]), text_type))
+                    new_nodes.append(TextNode(delimiter_term.sub("", matches[match_num]), text_type))
                     match_num += 1
     return new_nodes
 
@@ -93,8 +138,7 @@ def extract_markdown_images(text: str) -> list:
         A list of strings that match the image regex
     '''
     # Matches text in the form ![example](example.url)
-    pattern = r"!\[([^\]]*)\]\(([^\)]*)\)"
-    return re.findall(pattern, text)
+    return patterns.IMAGE.findall(text)
 
 
 def extract_markdown_links(text: str) -> list:
@@ -108,8 +152,7 @@ def extract_markdown_links(text: str) -> list:
         A list of strings that match the link regex
     '''
     # Matches text in the form [example](example.url)
-    pattern = r"(?<!!)\[([^\]]*)\]\(([^\)]*)\)"
-    return re.findall(pattern, text)
+    return patterns.LINK.findall(text)
 
 
 def split_nodes_image(old_nodes: list) -> list:
@@ -122,8 +165,6 @@ def split_nodes_image(old_nodes: list) -> list:
     Outputs:
         A new list of nodes containing the image nodes
     '''
-    # Regex to match the ![image](url) pattern
-    pattern = r"!\[[^\]]*\]\([^\)]*\)"
     new_nodes = []
     # Loops through the nodes
     for node in old_nodes:
@@ -137,7 +178,7 @@ def split_nodes_image(old_nodes: list) -> list:
         if len(imgs) == 0:
             return old_nodes
         # Splits the remaining text and enumerates through it (see split_nodes_delimiter for more thorough documentation)
-        remaining_text = re.sub(pattern, "|;&", node.text)
+        remaining_text = patterns.IMAGE_MARKUP.sub("|;&", node.text)
         match_num = 0
         for i, term in enumerate(remaining_text.split("|;&")):
             if i == 0 and term == "":
@@ -164,7 +205,6 @@ def split_nodes_link(old_nodes: list) -> list:
         A new list of nodes containing the link nodes
     '''
     # See split_nodes_image for more thorough documentation
-    pattern = r"(?<!!)\[[^\]]*\]\([^\)]*\)"
     new_nodes = []
     for node in old_nodes:
         if node.text_type != TextType.TEXT:
@@ -173,7 +213,7 @@ def split_nodes_link(old_nodes: list) -> list:
         links = extract_markdown_links(node.text)
         if len(links) == 0:
             return old_nodes
-        remaining_text = re.sub(pattern, "|;&", node.text)
+        remaining_text = patterns.LINK_MARKUP.sub("|;&", node.text)
         match_num = 0
         for i, term in enumerate(remaining_text.split("|;&")):
             if i == 0 and term == "":
@@ -189,6 +229,33 @@ def split_nodes_link(old_nodes: list) -> list:
     return new_nodes
 
 
+def split_emphasis(text: str, out_nodes: list) -> None:
+    '''
+    Splits a stretch of text with no images or links in it into text, bold, italic and code nodes
+
+    Inputs:
+        text: A string of markdown text
+        out_nodes: The list to append the nodes to
+    '''
+    # Position of the end of the last span, so the plain text between spans can be kept
+    pos = 0
+    # Scans the text once, taking the leftmost span each time
+    for match in patterns.INLINE_EMPHASIS.finditer(text):
+        if match.start() > pos:
+            out_nodes.append(TextNode(text[pos:match.start()], TextType.TEXT))
+        # The group that took part tells us which alternative matched
+        match match.lastgroup:
+            case "bold":
+                out_nodes.append(TextNode(match["bold"], TextType.BOLD))
+            case "italic":
+                out_nodes.append(TextNode(match["italic"], TextType.ITALIC))
+            case "code":
+                out_nodes.append(TextNode(match["code"], TextType.CODE))
+        pos = match.end()
+    if pos < len(text):
+        out_nodes.append(TextNode(text[pos:], TextType.TEXT))
+
+
 def text_to_text_nodes(text: str) -> list:
     '''
     Takes a string of markdown text and turns it into text node(s)
@@ -199,12 +266,20 @@ def text_to_text_nodes(text: str) -> list:
     Outputs:
         A list of nodes generated from the text
     '''
-    check = False
-    out_nodes = [TextNode(text, TextType.TEXT)]
-    out_nodes = split_nodes_image(out_nodes)
-    out_nodes = split_nodes_link(out_nodes)
-    out_nodes = split_nodes_delimiter(out_nodes, r"\*\*", TextType.BOLD)
-    out_nodes = split_nodes_delimiter(out_nodes, "_", TextType.ITALIC)
-    out_nodes = split_nodes_delimiter(out_nodes, "`", TextType.CODE)
+    out_nodes = []
+    # Position of the end of the last image or link, so the text between them can be kept
+    pos = 0
+    # Images and links take priority across the whole line, then the text between them is scanned for emphasis
+    for match in patterns.INLINE_MEDIA.finditer(text):
+        split_emphasis(text[pos:match.start()], out_nodes)
+        # The last group to close tells us which alternative matched
+        if match.lastgroup == "image_url":
+            out_nodes.append(TextNode(match["image_alt"], TextType.IMAGE, match["image_url"]))
+        else:
+            out_nodes.append(TextNode(match["link_text"], TextType.LINK, match["link_url"]))
+        pos = match.end()
+    # Keeps whatever text follows the last image or link (or the whole text if there were none)
+    split_emphasis(text[pos:], out_nodes)
+    if not out_nodes:
+        out_nodes.append(TextNode("", TextType.TEXT))
     return out_nodes
-
@@ -0,0 +1,274 @@
+'''
+Renders markdown a block at a time, so a page's memory use is bounded by its biggest block rather than its size
+
+Very large pages (generated references can run to tens of MB) are read in chunks, split into blocks as each one
+completes, and written out as each block is rendered, instead of being read, parsed and filled in whole. They can
+also be memory-mapped, in which case blocks and the title are found by byte offsets and only each block is decoded.
+'''
+import hashlib, mmap, os
+from contextlib import contextmanager
+import profiler
+import split_block
+from options import RenderOptions
+
+# Pages at least this big (in bytes) are streamed rather than read in whole
+STREAM_THRESHOLD = 8 * 1024 * 1024
+
+# How much of a page is read at a time, in characters
+CHUNK_SIZE = 64 * 1024
+
+# How much of a memory-mapped page is split into blocks at a time, in bytes
+WINDOW_SIZE = 1024 * 1024
+
+
+def find_title(markdown: str):
+    '''
+    Finds the first title line ("# " at the start of a line) without splitting the text into lines
+
+    Inputs:
+        markdown: A string of markdown
+
+    Outputs:
+        A string of the title without the markdown notation, or None if there isn't one
+    '''
+    if markdown.startswith("# "):
+        start = 0
+    else:
+        start = markdown.find("\n# ") + 1
+        if start == 0:
+            return None
+    end = markdown.find("\n", start)
+    return markdown[start + 2:] if end == -1 else markdown[start + 2:end]
+
+
+def split_chunks(chunks, newline="\n"):
+    '''
+    Splits text arriving in chunks on "\\n\\n", giving exactly the pieces joining the chunks and splitting them would,
+    without ever joining more than one piece
+
+    Inputs:
+        chunks: An iterable of strings (or of bytes, with a bytes newline)
+        newline: "\\n" or b"\\n"
+
+    Outputs:
+        A generator of pieces, unstripped and including empty ones
+    '''
+    separator = newline * 2
+    empty = newline[:0]
+    # The parts of the piece being read, which may span many chunks
+    pending = []
+    # A newline held back from the end of the last chunk in case the next chunk starts with one
+    carry = empty
+    for chunk in chunks:
+        parts = (carry + chunk).split(separator)
+        # Everything but the last part finishes a piece
+        for part in parts[:-1]:
+            pending.append(part)
+            yield empty.join(pending)
+            pending = []
+        last = parts[-1]
+        carry = newline if last.endswith(newline) else empty
+        pending.append(last[:-1] if carry else last)
+    pending.append(carry)
+    yield empty.join(pending)
+
+
+class MarkdownStream:
+    '''
+    Reads a markdown file a chunk at a time, yielding its blocks as they complete and picking up the title on the way
+    '''
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        # None until a title line has been read
+        self.title = None
+
+
+    def digest(self) -> str:
+        '''
+        Hashes the file's text a chunk at a time (matching a hash of the whole file read as a string), then rewinds it
+
+        Outputs:
+            A sha256 hex string
+        '''
+        digest = hashlib.sha256()
+        self.fp.seek(0)
+        while chunk := self.fp.read(self.chunk_size):
+            digest.update(chunk.encode())
+        self.fp.seek(0)
+        return digest.hexdigest()
+
+
+    def chunks(self):
+        '''
+        Yields the file's text a chunk at a time
+        '''
+        while True:
+            with profiler.stage("read"):
+                chunk = self.fp.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+    def raw_blocks(self):
+        '''
+        Yields the text between each "\\n\\n", unstripped and including empty pieces, exactly as str.split would
+        '''
+        for block in split_chunks(self.chunks()):
+            yield self.check_title(block)
+
+
+    def check_title(self, block: str) -> str:
+        # Blocks split on "\n\n" never cut a line in two, so the first block with a title line has the title
+        if self.title is None:
+            with profiler.stage("title extraction"):
+                self.title = find_title(block)
+        return block
+
+
+    def blocks(self):
+        '''
+        Yields each block, stripped and classified, skipping empty ones (see split_block.scan_blocks)
+
+        Outputs:
+            (block, BlockType) tuples
+        '''
+        for block in self.raw_blocks():
+            with profiler.stage("block splitting"):
+                block = block.strip()
+                block_type = split_block.classify_block(block) if block else None
+            if block:
+                yield block, block_type
+
+
+    def iter_html(self, basepath="/", options=RenderOptions()):
+        '''
+        Yields the page's content html a block at a time, the same html markdown_to_html_node would make
+
+        Inputs:
+            basepath: The root directory site-relative link and image urls are resolved against
+            options: The RenderOptions to render with
+        '''
+        yield "<div>"
+        # Skips the block cache, which would otherwise keep up to BLOCK_CACHE_SIZE of this page's blocks alive
+        yield from split_block.render_blocks(self.blocks(), basepath, options, cached=False)
+        yield "</div>"
+
+
+class MappedMarkdown(MarkdownStream):
+    '''
+    A memory-mapped markdown file, split into blocks by byte offsets so only the blocks themselves are ever decoded
+
+    The title is found up front with a single search of the mapped bytes, so no blocks are held waiting for it.
+    '''
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.title = None
+        # The same search as find_title, on the bytes
+        if buffer[:2] == b"# ":
+            start = 0
+        else:
+            # find's -1 makes start 0 when there's no title line at all
+            start = buffer.find(b"\n# ") + 1
+        if start or buffer[:2] == b"# ":
+            end = buffer.find(b"\n", start)
+            self.title = buffer[start + 2:len(buffer) if end == -1 else end].decode()
+
+
+    def digest(self) -> str:
+        # Hashes the mapped pages directly, without copying them
+        return hashlib.sha256(self.buffer).hexdigest()
+
+
+    def chunks(self):
+        '''
+        Yields the mapped bytes a window at a time
+        '''
+        for start in range(0, len(self.buffer), WINDOW_SIZE):
+            with profiler.stage("read"):
+                yield self.buffer[start:start + WINDOW_SIZE]
+
+
+    def raw_blocks(self):
+        '''
+        Yields the text between each "\\n\\n", exactly as MarkdownStream.raw_blocks does, decoding a block at a time
+        '''
+        # Splits whole windows rather than searching for each block boundary, which costs more in Python than the
+        # split does in C. "\n\n" can't appear inside a multi-byte utf-8 character, so splitting the bytes gives the
+        # same blocks as splitting the text.
+        for block in split_chunks(self.chunks(), b"\n"):
+            yield block.decode()
+
+
+@contextmanager
+def open_markdown(path: str, mapped=False, chunk_size=CHUNK_SIZE):
+    '''
+    Opens a markdown file to be read a block at a time
+
+    Inputs:
+        path: A path-string to the markdown file
+        mapped: Whether to memory-map the file rather than read it in chunks
+        chunk_size: How many characters to read at a time when not mapped
+
+    Outputs:
+        A context manager giving a MarkdownStream (or MappedMarkdown)
+    '''
+    # Empty files can't be mapped
+    if mapped and os.path.getsize(path):
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            # Reading as text turns "\r\n" into "\n", which byte offsets can't, so those files are read as text
+            if buffer.find(b"\r") == -1:
+                if hasattr(buffer, "madvise"):
+                    # The file is read front to back once, so the kernel can read ahead and drop pages behind
+                    buffer.madvise(mmap.MADV_SEQUENTIAL)
+                yield MappedMarkdown(buffer)
+                return
+    with open(path, "r") as f:
+        yield MarkdownStream(f, chunk_size)
+
+
+def stream_page(stream: MarkdownStream, template, output, basepath="/", options=RenderOptions()) -> str:
+    '''
+    Fills a template with a markdown file's title and content, reading and writing a block at a time
+
+    Blocks read before the title is found are held until it is, since the title is usually needed first.
+
+    Inputs:
+        stream: A MarkdownStream (or MappedMarkdown) of the page's markdown
+        template: A Template object
+        output: A file object opened for writing text
+        basepath: The program's root directory
+        options: The RenderOptions to render with
+
+    Outputs:
+        The page's title
+    '''
+    html = stream.iter_html(basepath, options)
+    # Rendered blocks waiting on the title
+    held = []
+    for literal, slot in zip(template.literals, template.slots):
+        output.write(literal)
+        if slot == "Title":
+            while stream.title is None:
+                fragment = next(html, None)
+                if fragment is None:
+                    raise Exception("Markdown must have a title")
+                held.append(fragment)
+            output.write(stream.title)
+        elif slot == "Content":
+            with profiler.stage("write"):
+                output.writelines(held)
+            held = []
+            for fragment in html:
+                with profiler.stage("write"):
+                    output.write(fragment)
+        else:
+            output.write(f"{{{{ {slot} }}}}")
+    output.write(template.literals[-1])
+    # A template without a title slot still needs a page with a title
+    for fragment in html:
+        pass
+    if stream.title is None:
+        raise Exception("Markdown must have a title")
+    return stream.title
@@ -0,0 +1,187 @@
+'''
+Copies files into the docs folder only when they've changed, optionally as hard links or reflinks instead of copies
+'''
+import os, shutil, threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from manifest import file_hash
+from walk import walk_files, walk_dirs
+import profiler
+
+LINK_MODES = ("copy", "hardlink", "reflink")
+
+# The Linux ioctl that asks the filesystem for a copy-on-write clone (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+
+def is_synced(src_path: str, dest_path: str, checksum=False) -> bool:
+    '''
+    Checks whether a destination file already matches its source
+
+    Inputs:
+        src_path: A path-string to the source file
+        dest_path: A path-string to the destination file
+        checksum: Whether to compare contents when the sizes match but the mtimes don't
+
+    Outputs:
+        True if the destination doesn't need updating, False otherwise
+    '''
+    try:
+        dest_stat = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+    src_stat = os.stat(src_path)
+    # A hard link to the source is always current
+    if (src_stat.st_dev, src_stat.st_ino) == (dest_stat.st_dev, dest_stat.st_ino):
+        return True
+    if src_stat.st_size != dest_stat.st_size:
+        return False
+    if src_stat.st_mtime_ns == dest_stat.st_mtime_ns:
+        return True
+    if checksum and file_hash(src_path) == file_hash(dest_path):
+        # Copies the mtime across so the next check doesn't need to hash again
+        shutil.copystat(src_path, dest_path)
+        return True
+    return False
+
+
+def reflink(src_path: str, dest_path: str) -> None:
+    '''
+    Clones a file without copying its data, raising OSError where the platform or filesystem can't
+    '''
+    import fcntl
+    with open(src_path, "rb") as src, open(dest_path, "wb") as dest:
+        fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+
+
+def place_file(src_path: str, dest_path: str, link="copy") -> None:
+    '''
+    Puts a copy of a file at a destination, replacing whatever was there
+
+    Inputs:
+        src_path: A path-string to the source file
+        dest_path: A path-string to the destination file
+        link: "copy", "hardlink" (shares the file with the source, so don't edit outputs in place)
+            or "reflink" (a copy-on-write clone, falling back to a copy where unsupported)
+    '''
+    # Builds the file under a temporary name so a failure never leaves half a file behind
+    tmp_path = f"{dest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        if link == "hardlink":
+            try:
+                os.link(src_path, tmp_path)
+            except OSError:
+                # e.g. the docs folder is on another filesystem
+                shutil.copy2(src_path, tmp_path)
+        elif link == "reflink":
+            try:
+                reflink(src_path, tmp_path)
+                shutil.copystat(src_path, tmp_path)
+            except (OSError, ImportError):
+                shutil.copy2(src_path, tmp_path)
+        else:
+            shutil.copy2(src_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+
+
+def sync_file(src_path: str, dest_path: str, link="copy", checksum=False) -> bool:
+    '''
+    Updates a destination file from its source if it's out of date
+
+    Inputs:
+        src_path, dest_path, link, checksum: See is_synced and place_file
+
+    Outputs:
+        True if the file was updated, False if it was already current
+    '''
+    if is_synced(src_path, dest_path, checksum):
+        return False
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    place_file(src_path, dest_path, link)
+    return True
+
+
+def remove_stale(dest: str, expected: set) -> int:
+    '''
+    Deletes every file in a folder that isn't expected there, then any folders left empty
+
+    Inputs:
+        dest: A path-string to the folder to clean
+        expected: A set of path-strings (relative to the folder) to keep
+
+    Outputs:
+        The number of files deleted
+    '''
+    removed = 0
+    for rel_path, entry in list(walk_files(dest)):
+        if rel_path not in expected:
+            os.remove(entry.path)
+            removed += 1
+    # Deepest folders first, so parents emptied by their children go too
+    for path, _ in reversed(walk_dirs(dest)):
+        if not os.listdir(path):
+            os.rmdir(path)
+    return removed
+
+
+def timed_copy(func, *args):
+    '''
+    Runs a copy, timing it as part of the static copy stage when profiling
+    '''
+    with profiler.stage("static copy"):
+        return func(*args)
+
+
+class AssetCopier:
+    '''
+    Runs file copies on a pool of threads in the background (so they overlap with page rendering), holding on
+    to any failures until wait() is called
+    '''
+    def __init__(self, jobs=1):
+        # With a single job, copies run straight away on the calling thread
+        self.pool = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="copy") if jobs > 1 else None
+        self.tasks = []
+
+
+    def submit(self, func, src_path: str, *args) -> Future:
+        '''
+        Queues a copy
+
+        Inputs:
+            func: The function doing the copy (e.g. sync_file or place_file)
+            src_path: A path-string to the file being copied, passed first to func and used in error reports
+            args: Any other arguments for func
+
+        Outputs:
+            A Future holding func's result
+        '''
+        if self.pool:
+            future = self.pool.submit(timed_copy, func, src_path, *args)
+        else:
+            future = Future()
+            try:
+                future.set_result(timed_copy(func, src_path, *args))
+            except Exception as e:
+                future.set_exception(e)
+        self.tasks.append((src_path, future))
+        return future
+
+
+    def wait(self) -> list:
+        '''
+        Waits for every queued copy to finish
+
+        Outputs:
+            A list of (source path-string, exception) tuples for the copies that failed, in the order they were queued
+        '''
+        failures = []
+        for src_path, future in self.tasks:
+            error = future.exception()
+            if error:
+                failures.append((src_path, error))
+        if self.pool:
+            self.pool.shutdown()
+        self.tasks = []
+        return failures
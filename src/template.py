@@ -0,0 +1,168 @@
+import os, hashlib
+from functools import lru_cache
+from htmlnode import HTMLNode
+import patterns
+
+
+def minify_html(text: str) -> str:
+    '''
+    Collapses insignificant whitespace in html, leaving <pre>, <textarea>, <script> and <style> elements as they are
+
+    Whitespace between tags is dropped where it spans a line break (indentation), and every other run of whitespace
+    becomes a single space, since browsers render them the same.
+
+    Inputs:
+        text: A string of html
+
+    Outputs:
+        The minified string
+    '''
+    # re.split with two groups gives [text, element, tag name, text, element, tag name, ..., text]
+    parts = patterns.MINIFY_PRESERVE.split(text)
+    out = []
+    for i in range(0, len(parts), 3):
+        # Wraps the text in the tags either side of it so indentation next to a preserved element goes too
+        part = patterns.MINIFY_BETWEEN_TAGS.sub("><", f">{parts[i]}<")[1:-1]
+        out.append(patterns.WHITESPACE_RUN.sub(" ", part))
+        if i + 1 < len(parts):
+            out.append(parts[i + 1])
+    return "".join(out).strip()
+
+
+class Template:
+    '''
+    An html template parsed once into literal text segments and named slots like {{ Title }} and {{ Content }}
+
+    Templates can pull in shared partials with {{ include path }}, where the path is relative to the including file.
+    '''
+    def __init__(self, text: str, basepath="/", path=None, minify=False, assets=None):
+        # Every partial read while parsing, mapped to its (mtime_ns, size) at the time, so changes can be spotted
+        self.includes = {}
+        path = os.path.abspath(path) if path else None
+        text = self.expand(text, path)
+        # Identifies the template's source (partials included), e.g. for keying cached pages
+        self.digest = hashlib.sha256(text.encode()).hexdigest()
+        # Node values filled in later are serialized to match
+        self.minify = minify
+        # Minifies the template once here, so filling it in costs nothing extra
+        if minify:
+            text = minify_html(text)
+        # Swaps asset urls for their fingerprinted ones, before they're moved under the basepath
+        if assets:
+            text = patterns.TEMPLATE_URL.sub(lambda m: m[1] + assets.get(m[2], m[2]), text)
+        # Points the template's own resource paths at the basepath up front, so pages never need rewriting
+        text = text.replace('href="/', f'href="{basepath}').replace('src="/', f'src="{basepath}')
+        # re.split with a group alternates literal text and slot names: [text, slot, text, slot, ..., text]
+        parts = patterns.TEMPLATE_SLOT.split(text)
+        self.literals = parts[0::2]
+        self.slots = parts[1::2]
+
+
+    def expand(self, text: str, path=None, stack=()) -> str:
+        '''
+        Replaces each {{ include path }} in a template's text with the partial's own (expanded) text
+
+        Inputs:
+            text: The text to expand
+            path: A path-string to the file the text came from (includes are resolved next to it), if any
+            stack: The files being expanded, outermost first, to catch partials that include themselves
+
+        Outputs:
+            The expanded text
+        '''
+        folder = os.path.dirname(path) if path else os.getcwd()
+        stack = stack + (path,)
+        def include(match):
+            partial = os.path.normpath(os.path.join(folder, match[1]))
+            if partial in stack:
+                raise ValueError(f"Template include cycle: {' -> '.join(i for i in stack if i)} -> {partial}")
+            stat = os.stat(partial)
+            with open(partial, "r") as f:
+                partial_text = f.read()
+            self.includes[partial] = (stat.st_mtime_ns, stat.st_size)
+            return self.expand(partial_text, partial, stack)
+        return patterns.TEMPLATE_INCLUDE.sub(include, text)
+
+
+    def is_current(self) -> bool:
+        '''
+        Checks that none of the template's partials have changed since it was parsed
+        '''
+        for path, recorded in self.includes.items():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                return False
+            if (stat.st_mtime_ns, stat.st_size) != recorded:
+                return False
+        return True
+
+
+    def iter_segments(self, values: dict):
+        '''
+        Yields the template's pieces in order, with each slot replaced by its value
+
+        Inputs:
+            values: A dict of slot names to strings or HTMLNodes (slots without a value are left as they are)
+        '''
+        for literal, slot in zip(self.literals, self.slots):
+            yield literal
+            yield values.get(slot, f"{{{{ {slot} }}}}")
+        yield self.literals[-1]
+
+
+    def render(self, **values) -> str:
+        '''
+        Fills the template's slots and returns the page as a string
+
+        Inputs:
+            values: Slot names mapped to strings or HTMLNodes (nodes are minified if the template is)
+
+        Outputs:
+            A string of html
+        '''
+        return ''.join(i.to_html(self.minify) if isinstance(i, HTMLNode) else i for i in self.iter_segments(values))
+
+
+    def write(self, fp, **values) -> None:
+        '''
+        Fills the template's slots and writes the page to a file, streaming any HTMLNode values
+
+        Inputs:
+            fp: A file object opened for writing text
+            values: Slot names mapped to strings or HTMLNodes (nodes are minified if the template is)
+        '''
+        for segment in self.iter_segments(values):
+            if isinstance(segment, HTMLNode):
+                segment.write_html(fp, minify=self.minify)
+            else:
+                fp.write(segment)
+
+
+@lru_cache(maxsize=16)
+def _parse_template(path: str, basepath: str, minify: bool, assets, mtime_ns: int, size: int) -> Template:
+    with open(path, "r") as f:
+        return Template(f.read(), basepath, path, minify, assets)
+
+
+def load_template(path: str, basepath="/", minify=False, assets=None) -> Template:
+    '''
+    Gets the parsed template for a file, only re-reading it when the file changes
+
+    Inputs:
+        path: A path-string to the html template
+        basepath: The program's root directory
+        minify: Whether to collapse the template's whitespace (see minify_html)
+        assets: An optional AssetMap of fingerprinted asset urls to point the template at
+
+    Outputs:
+        A Template object
+    '''
+    stat = os.stat(path)
+    # The file's mtime and size are part of the cache key, so an edited template is parsed again
+    template = _parse_template(path, basepath, minify, assets, stat.st_mtime_ns, stat.st_size)
+    # Partials aren't part of the key (they're only known once parsed), so they're checked separately
+    if not template.is_current():
+        _parse_template.cache_clear()
+        template = _parse_template(path, basepath, minify, assets, stat.st_mtime_ns, stat.st_size)
+    return template
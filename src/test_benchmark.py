@@ -0,0 +1,45 @@
+import unittest, os, tempfile
+from benchmark import synthetic_markdown, generate_corpus, parse_mix, node_tree, count_nodes
+from split_block import markdown_to_blocks, block_to_block_type, markdown_to_html_node
+from block import BlockType
+
+
+class Tests(unittest.TestCase):
+    def test_synthetic_markdown_is_repeatable(self):
+        self.assertEqual(synthetic_markdown(50, seed=3), synthetic_markdown(50, seed=3))
+        self.assertNotEqual(synthetic_markdown(50, seed=3), synthetic_markdown(50, seed=4))
+
+
+    def test_synthetic_markdown_mix(self):
+        # Only code blocks were asked for, so everything after the title is code
+        blocks = markdown_to_blocks(synthetic_markdown(20, mix={"code": 1}))
+        self.assertEqual(len(blocks), 21)
+        self.assertEqual({block_to_block_type(i) for i in blocks[1:]}, {BlockType.CODE})
+
+
+    def test_generate_corpus(self):
+        with tempfile.TemporaryDirectory() as folder:
+            documents = generate_corpus(folder, 25, 5)
+            pages = [os.path.join(root, f) for root, _, files in os.walk(os.path.join(folder, "content")) for f in files]
+            self.assertEqual(len(pages), 25)
+            self.assertEqual(len(documents), 25)
+            self.assertTrue(os.path.isfile(os.path.join(folder, "template.html")))
+            self.assertTrue(os.path.isdir(os.path.join(folder, "static")))
+
+
+    def test_node_tree(self):
+        markdown = "# Title\n\nSome **bold** text"
+        node = node_tree(markdown)
+        # The real nodes (div, h1, text, p, three inline nodes), not one raw html leaf per block
+        self.assertEqual(count_nodes(node), 7)
+        self.assertEqual(node.to_html(), markdown_to_html_node(markdown).to_html())
+
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix("paragraph=4,code"), {"paragraph": 4.0, "code": 1.0})
+        with self.assertRaises(Exception):
+            parse_mix("table=1")
+
+
+if __name__ == "__main__":
+    unittest.main()
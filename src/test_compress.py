@@ -0,0 +1,75 @@
+import unittest
+import gzip, os, tempfile
+from compress import compress_file, compress_tree, available_formats
+
+PAGE = "<p>" + "Lots of repetitive html. " * 200 + "</p>"
+
+
+class TestCompress(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = self.tmp.name
+
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+    def write(self, rel_path, data):
+        path = os.path.join(self.dest, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+
+    def test_compress_file(self):
+        path = self.write("index.html", PAGE.encode())
+        self.assertEqual(compress_file(path, ["gzip"]), 1)
+        with gzip.open(path + ".gz") as f:
+            self.assertEqual(f.read(), PAGE.encode())
+        # Current variants are skipped until the file changes
+        self.assertEqual(compress_file(path, ["gzip"]), 0)
+        self.write("index.html", (PAGE * 2).encode())
+        self.assertEqual(compress_file(path, ["gzip"]), 1)
+
+
+    def test_output_is_reproducible(self):
+        path = self.write("index.html", PAGE.encode())
+        compress_file(path, ["gzip"])
+        with open(path + ".gz", "rb") as f:
+            first = f.read()
+        os.remove(path + ".gz")
+        compress_file(path, ["gzip"])
+        with open(path + ".gz", "rb") as f:
+            self.assertEqual(f.read(), first)
+
+
+    def test_skips_variants_that_are_not_smaller(self):
+        path = self.write("tiny.css", b"a{}")
+        self.assertEqual(compress_file(path, ["gzip"]), 0)
+        self.assertFalse(os.path.exists(path + ".gz"))
+
+
+    def test_compress_tree(self):
+        page = self.write("blog/index.html", PAGE.encode())
+        self.write("style.css", PAGE.encode())
+        self.write("image.png", PAGE.encode())
+        orphan = self.write("old/index.html.gz", b"stale")
+        archive = self.write("data.tar.gz", b"not ours")
+        jobs = 3
+        self.assertEqual(compress_tree(self.dest, ["gzip"], 9, jobs), (2, 1))
+        self.assertTrue(os.path.exists(page + ".gz"))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "image.png.gz")))
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(archive))
+        # Dropping a format deletes its variants
+        self.assertEqual(compress_tree(self.dest, [], 9, jobs), (0, 2))
+
+
+    def test_available_formats(self):
+        self.assertIn("gzip", available_formats())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import hashlib, os, tempfile
+from unittest import mock
+from fingerprint import AssetMap, fingerprint_assets, fingerprinted_path
+from manifest import HashCache
+from template import Template
+from main import build_full, build_incremental
+from options import BuildSettings
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.static = os.path.join(root, "static")
+        self.content = os.path.join(root, "content")
+        self.dest = os.path.join(root, "docs")
+        self.template = os.path.join(root, "template.html")
+        os.makedirs(os.path.join(self.static, "images"))
+        os.makedirs(self.content)
+        self.write(self.template, '<link href="/index.css" /><a href="/about">{{ Title }}</a>{{ Content }}')
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.static, "images", "cat.png"), "not really a png")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n![cat](/images/cat.png)")
+        # Keeps the hash cache out of the project's .cache folder
+        patcher = mock.patch("main.HASHES", os.path.join(root, "fingerprints.json"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+
+    def test_fingerprinted_path(self):
+        self.assertEqual(fingerprinted_path(os.path.join("images", "cat.png"), "0123456789abcdef"), os.path.join("images", "cat.0123456789.png"))
+
+
+    def test_hash_cache(self):
+        path = os.path.join(self.static, "index.css")
+        hashes = HashCache(os.path.join(self.tmp.name, "hashes.json"))
+        self.assertEqual(hashes.hash(path), hashlib.sha256(b"body {}").hexdigest())
+        hashes.save()
+        # A reloaded cache trusts the recorded hash while the mtime and size match
+        hashes = HashCache(os.path.join(self.tmp.name, "hashes.json"))
+        with mock.patch("manifest.file_hash") as file_hash:
+            hashes.hash(path)
+            file_hash.assert_not_called()
+
+
+    def test_asset_map(self):
+        plan = {"index.css": (os.path.join(self.static, "index.css"), False), "index.html": (os.path.join(self.content, "index.md"), True)}
+        assets, renamed = fingerprint_assets(plan, HashCache(os.path.join(self.tmp.name, "hashes.json")))
+        digest = hashlib.sha256(b"body {}").hexdigest()[:10]
+        self.assertEqual(assets.mapping, {"/index.css": f"/index.{digest}.css"})
+        self.assertEqual(renamed, {f"index.{digest}.css": plan["index.css"]})
+        # Equal maps are interchangeable as cache keys
+        self.assertEqual(hash(assets), hash(AssetMap(dict(assets.mapping))))
+        self.assertEqual(assets, AssetMap(dict(assets.mapping)))
+
+
+    def test_template(self):
+        assets = AssetMap({"/index.css": "/index.abc.css"})
+        template = Template('<link href="/index.css" /><a href="/about">x</a>', "/site/", assets=assets)
+        self.assertEqual(template.render(), '<link href="/site/index.abc.css" /><a href="/site/about">x</a>')
+
+
+    def test_build(self):
+        build_full("/", self.static, self.content, self.template, self.dest, settings=BuildSettings(fingerprint=True))
+        css = "index." + hashlib.sha256(b"body {}").hexdigest()[:10] + ".css"
+        png = "cat." + hashlib.sha256(b"not really a png").hexdigest()[:10] + ".png"
+        self.assertEqual(sorted(os.listdir(self.dest)), sorted(["images", css, "index.css", "index.html"]))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.dest, "images"))), sorted(["cat.png", png]))
+        self.assertEqual(
+            self.read(os.path.join(self.dest, "index.html")),
+            f'<link href="/{css}" /><a href="/about">Home</a><div><h1>Home</h1><p><img src="/images/{png}" alt="cat"></img></p></div>',
+        )
+
+
+    def test_incremental_rename(self):
+        manifest = os.path.join(self.tmp.name, "manifest.json")
+        build_incremental("/", self.static, self.content, self.template, self.dest, manifest, settings=BuildSettings(fingerprint=True))
+        self.write(os.path.join(self.static, "index.css"), "body { color: red }")
+        build_incremental("/", self.static, self.content, self.template, self.dest, manifest, settings=BuildSettings(fingerprint=True))
+        css = "index." + hashlib.sha256(b"body { color: red }").hexdigest()[:10] + ".css"
+        # The old name is deleted and the page points at the new one
+        self.assertEqual(sorted(os.listdir(self.dest)), sorted(["images", css, "index.css", "index.html"]))
+        self.assertIn(f'href="/{css}"', self.read(os.path.join(self.dest, "index.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+import io
 
 from htmlnode import HTMLNode, LeafNode, ParentNode
 
@@ -53,5 +54,39 @@ class TestTextNode(unittest.TestCase):
         )
 
 
+    def test_slots(self):
+        for node in (HTMLNode(), LeafNode("b", "x"), ParentNode("p", [])):
+            self.assertFalse(hasattr(node, "__dict__"))
+
+
+    def test_iter_html(self):
+        parent_node = ParentNode("div", [LeafNode("b", "one"), ParentNode("p", [LeafNode(None, "two")])])
+        self.assertEqual(list(parent_node.iter_html()), ["<div>", "<b>one</b>", "<p>", "two", "</p>", "</div>"])
+        out = io.StringIO()
+        parent_node.write_html(out, buffer_size=2)
+        self.assertEqual(out.getvalue(), parent_node.to_html())
+
+
+    def test_deep_tree(self):
+        # Deeper than the recursion limit, which the old recursive to_html couldn't write out
+        node = LeafNode("b", "deep")
+        for _ in range(5000):
+            node = ParentNode("span", [node])
+        self.assertTrue(node.to_html().startswith("<span><span>"))
+
+
+    def test_minify(self):
+        node = ParentNode("p", [LeafNode("img", "", {"src": "/a b.png", "alt": "x"}), LeafNode("a", "link", {"href": "/blog/tom", "class": " big  red "})])
+        self.assertEqual(
+            node.to_html(minify=True),
+            '<p><img src="/a b.png" alt=x><a href=/blog/tom class="big red">link</a></p>',
+        )
+        # Leaves the normal output alone
+        self.assertEqual(node.to_html(), '<p><img src="/a b.png" alt="x"></img><a href="/blog/tom" class=" big  red ">link</a></p>')
+        out = io.StringIO()
+        node.write_html(out, minify=True)
+        self.assertEqual(out.getvalue(), node.to_html(minify=True))
+
+
 if __name__ == "__main__":
     unittest.main()
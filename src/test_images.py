@@ -0,0 +1,167 @@
+import unittest
+import io, os, struct, tempfile, zlib
+from unittest import mock
+from images import (ImageMap, decode_png, encode_png, image_size, measure_images, optimize_images, png_header,
+                    process_image, read_chunks, recompress_png, resize_rows, unfilter, variant_path, write_chunk,
+                    PNG_SIGNATURE)
+from manifest import HashCache
+from options import RenderOptions
+from split_block import markdown_to_html_node
+from splitter_funcs import text_node_to_html_node
+from stream import MarkdownStream
+from textnode import TextNode, TextType
+
+
+def gradient(width, height, bpp):
+    # A deterministic test image whose rows all differ
+    return [bytes((x * 7 + y * 3 + c * 50) % 256 for x in range(width) for c in range(bpp)) for y in range(height)]
+
+
+class TestImages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+    def test_round_trip(self):
+        for color, bpp in [(0, 1), (2, 3), (4, 2), (6, 4)]:
+            rows = gradient(13, 7, bpp)
+            self.assertEqual(decode_png(encode_png(13, 7, color, rows)), (13, 7, color, rows))
+
+
+    def test_unfilter(self):
+        # One row per filter type (None, Sub, Up, Average, Paeth), 2 pixels of 1 byte each
+        filtered = bytes([0, 10, 20, 1, 5, 5, 2, 1, 1, 3, 4, 4, 4, 1, 1])
+        self.assertEqual(unfilter(filtered, 2, 5, 1), [bytes([10, 20]), bytes([5, 10]), bytes([6, 11]), bytes([7, 13]), bytes([8, 14])])
+
+
+    def test_resize(self):
+        rows = [bytes([0, 100, 10, 110]), bytes([20, 120, 30, 130])]
+        # Two 2-channel pixels per row, shrunk to a single pixel averaging all four
+        self.assertEqual(resize_rows(2, 2, 2, rows, 1), (1, [bytes([15, 115])]))
+
+
+    def test_recompress_drops_metadata(self):
+        rows = gradient(8, 8, 3)
+        png = encode_png(8, 8, 2, rows, level=1)
+        chunks = read_chunks(png)
+        png = PNG_SIGNATURE + write_chunk(b"IHDR", chunks[0][1]) + write_chunk(b"tEXt", b"Comment\0" + b"x" * 100) + b"".join(write_chunk(k, v) for k, v in chunks[1:])
+        out = recompress_png(png)
+        self.assertEqual([i[0] for i in read_chunks(out)], [b"IHDR", b"IDAT", b"IEND"])
+        self.assertEqual(decode_png(out)[3], rows)
+
+
+    def test_unsupported(self):
+        # Palette images can still be re-encoded, just not resized
+        header = struct.pack(">IIBBBBB", 4, 1, 8, 3, 0, 0, 0)
+        png = PNG_SIGNATURE + write_chunk(b"IHDR", header) + write_chunk(b"PLTE", bytes(3)) + write_chunk(b"IDAT", zlib.compress(bytes(5))) + write_chunk(b"IEND", b"")
+        path = os.path.join(self.tmp.name, "palette.png")
+        with open(path, "wb") as f:
+            f.write(png)
+        width, height, _, variants = process_image(path, "abc", (2,), self.tmp.name)
+        self.assertEqual((width, height, variants), (4, 1, []))
+
+
+    def test_optimize_images(self):
+        src = os.path.join(self.tmp.name, "static", "images", "wide.png")
+        os.makedirs(os.path.dirname(src))
+        with open(src, "wb") as f:
+            f.write(encode_png(40, 20, 2, gradient(40, 20, 3), level=1))
+        plan = {os.path.join("images", "wide.png"): (src, False)}
+        cache = os.path.join(self.tmp.name, "cache")
+        # Looking up a cold cache makes nothing, and leaves the image at full size
+        images, updates = optimize_images(plan, (10, 80), HashCache(os.path.join(self.tmp.name, "hashes.json")), cache, read_only=True)
+        self.assertEqual((images.get("/images/wide.png"), updates[os.path.join("images", "wide.png")]), ((40, 20, ()), (src, False)))
+        self.assertFalse(os.path.exists(cache))
+        images, updates = optimize_images(plan, (10, 80), HashCache(os.path.join(self.tmp.name, "hashes.json")), cache)
+        # Once the cache is warm, looking it up gives the same result as optimizing
+        self.assertEqual(optimize_images(plan, (10, 80), HashCache(os.path.join(self.tmp.name, "hashes.json")), cache, read_only=True), (images, updates))
+        self.assertEqual(images.get("/images/wide.png"), (40, 20, (("/images/wide-10w.png", 10), ("/images/wide.png", 40))))
+        small, _ = updates[variant_path(os.path.join("images", "wide.png"), 10)]
+        with open(small, "rb") as f:
+            self.assertEqual(png_header(f.read())[:2], (10, 5))
+        # A second build reuses the cached files rather than making them again
+        mtime = os.stat(small).st_mtime_ns
+        optimize_images(plan, (10, 80), HashCache(os.path.join(self.tmp.name, "hashes.json")), cache)
+        self.assertEqual(os.stat(small).st_mtime_ns, mtime)
+
+
+    def test_animated_png(self):
+        png = encode_png(8, 4, 0, gradient(8, 4, 1))
+        chunks = read_chunks(png)
+        # An animation control chunk (one frame, played once) after the header marks the png as animated
+        animated = PNG_SIGNATURE + write_chunk(b"IHDR", chunks[0][1]) + write_chunk(b"acTL", struct.pack(">II", 1, 1)) + b"".join(write_chunk(k, v) for k, v in chunks[1:])
+        path = os.path.join(self.tmp.name, "animated.png")
+        with open(path, "wb") as f:
+            f.write(animated)
+        # The source is published unchanged, with no resized copies
+        self.assertEqual(process_image(path, "abc", (2,), self.tmp.name), (8, 4, path, []))
+
+
+    def test_optimize_broken_images(self):
+        fake = os.path.join(self.tmp.name, "fake.png")
+        with open(fake, "w") as f:
+            f.write("not really a png")
+        # A real header in front of pixel data that won't decompress
+        header = struct.pack(">IIBBBBB", 4, 1, 8, 0, 0, 0, 0)
+        corrupt = os.path.join(self.tmp.name, "corrupt.png")
+        with open(corrupt, "wb") as f:
+            f.write(PNG_SIGNATURE + write_chunk(b"IHDR", header) + write_chunk(b"IDAT", b"garbage") + write_chunk(b"IEND", b""))
+        plan = {"fake.png": (fake, False), "corrupt.png": (corrupt, False)}
+        for jobs in (1, 2):
+            images, updates = optimize_images(plan, (2,), HashCache(os.path.join(self.tmp.name, "hashes.json")), os.path.join(self.tmp.name, "cache"), jobs)
+            # Both are left to be copied as they are
+            self.assertEqual((images.mapping, updates), ({}, {}))
+
+
+    def test_img_attributes(self):
+        images = ImageMap({"/images/a.png": (40, 20, (("/images/a-10w.png", 10), ("/images/a.png", 40)))})
+        node = text_node_to_html_node(TextNode("A", TextType.IMAGE, "/images/a.png"), "/site/", RenderOptions(images=images))
+        self.assertEqual(
+            node.to_html(),
+            '<img src="/site/images/a.png" alt="A" srcset="/site/images/a-10w.png 10w, /site/images/a.png 40w" width="40" height="20"></img>',
+        )
+        # Images the build didn't optimize are left alone
+        node = text_node_to_html_node(TextNode("B", TextType.IMAGE, "/b.png"), "/", RenderOptions(images=images))
+        self.assertEqual(node.props, {"src": "/b.png", "alt": "B"})
+
+
+    def test_image_size(self):
+        path = os.path.join(self.tmp.name, "a.png")
+        with open(path, "wb") as f:
+            f.write(encode_png(6, 3, 0, gradient(6, 3, 1)))
+        self.assertEqual(image_size(path), (6, 3))
+        # Only the header is read, and only once while the file is unchanged
+        with mock.patch("builtins.open") as opened:
+            self.assertEqual(image_size(path), (6, 3))
+            opened.assert_not_called()
+        with open(os.path.join(self.tmp.name, "b.png"), "w") as f:
+            f.write("not an image")
+        plan = {"a.png": (path, False), "b.png": (os.path.join(self.tmp.name, "b.png"), False)}
+        self.assertEqual(measure_images(plan).mapping, {"/a.png": (6, 3, ())})
+
+
+    def test_lazy_images(self):
+        images = ImageMap({f"/{i}.png": (4, 2, ()) for i in range(3)})
+        markdown = "# Title\n\n![zero](/0.png) ![one](/1.png)\n\n![two](/2.png)"
+        html = markdown_to_html_node(markdown, "/", RenderOptions(images=images, eager_images=1)).to_html()
+        self.assertEqual(
+            html,
+            '<div><h1>Title</h1><p><img src="/0.png" alt="zero" width="4" height="2"></img> '
+            '<img src="/1.png" alt="one" width="4" height="2" loading="lazy" decoding="async"></img></p>'
+            '<p><img src="/2.png" alt="two" width="4" height="2" loading="lazy" decoding="async"></img></p></div>',
+        )
+        # Streamed pages count images across blocks the same way
+        stream = MarkdownStream(io.StringIO(markdown), 5)
+        self.assertEqual("".join(stream.iter_html("/", RenderOptions(images=images, eager_images=1))), html)
+        # Only image nodes count, not text that happens to look like one
+        markdown = "```\n<img src=\"/x.png\">\n```\n\n![zero](/0.png)"
+        html = markdown_to_html_node(markdown, "/", RenderOptions(images=images, eager_images=1)).to_html()
+        self.assertIn('<img src="/0.png" alt="zero" width="4" height="2"></img>', html)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+import os, tempfile
+from unittest import mock
+from manifest import Manifest
+from config import PROJECT
+from main import build_incremental, explain
+from options import BuildSettings, RenderOptions
+
+
+class TestIncremental(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.static = os.path.join(root, "static")
+        self.content = os.path.join(root, "content")
+        self.dest = os.path.join(root, "docs")
+        self.template = os.path.join(root, "template.html")
+        self.manifest = os.path.join(root, ".cache", "manifest.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.static)
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nHello")
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog\n\nPosts")
+
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+
+    def build(self, options=RenderOptions()):
+        build_incremental("/", self.static, self.content, self.template, self.dest, self.manifest, options=options)
+        return Manifest(self.manifest, PROJECT)
+
+
+    def test_first_build(self):
+        manifest = self.build()
+        self.assertEqual(sorted(manifest.outputs), ["blog/index.html", "index.css", "index.html"])
+        with open(os.path.join(self.dest, "blog", "index.html")) as f:
+            self.assertEqual(f.read(), "<title>Blog</title><div><h1>Blog</h1><p>Posts</p></div>")
+
+
+    def test_only_changed_pages_rebuild(self):
+        self.build()
+        home = os.path.join(self.dest, "index.html")
+        # Marks the built page so we can tell whether it gets rewritten
+        self.write(home, "untouched")
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog\n\nMore posts")
+        self.build()
+        with open(home) as f:
+            self.assertEqual(f.read(), "untouched")
+        with open(os.path.join(self.dest, "blog", "index.html")) as f:
+            self.assertIn("More posts", f.read())
+
+
+    def test_template_change_rebuilds_pages(self):
+        self.build()
+        self.write(self.template, "<h2>{{ Title }}</h2>{{ Content }}")
+        self.build()
+        with open(os.path.join(self.dest, "index.html")) as f:
+            self.assertTrue(f.read().startswith("<h2>Home</h2>"))
+
+
+    def test_removed_sources_are_deleted(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "index.md"))
+        manifest = self.build()
+        self.assertNotIn("blog/index.html", manifest.outputs)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog")))
+
+
+    def test_partial_change_rebuilds_pages_only(self):
+        os.makedirs(os.path.join(self.tmp.name, "partials"))
+        nav = os.path.join(self.tmp.name, "partials", "nav.html")
+        self.write(nav, "<nav>one</nav>")
+        self.write(self.template, "{{ include partials/nav.html }}{{ Content }}")
+        manifest = self.build()
+        self.assertEqual(manifest.dependents(manifest.relative(nav)), ["blog/index.html", "index.html"])
+        self.write(nav, "<nav>two!</nav>")
+        manifest = self.build()
+        self.assertEqual(manifest.reasons["index.html"], [f"{manifest.relative(nav)} changed"])
+        # The stylesheet doesn't depend on the template, so it wasn't rebuilt
+        self.assertEqual(manifest.reasons["index.css"], ["new output"])
+        with open(os.path.join(self.dest, "index.html")) as f:
+            self.assertTrue(f.read().startswith("<nav>two!</nav>"))
+
+
+    def test_minify_rebuilds_pages(self):
+        self.build()
+        manifest = self.build(RenderOptions(minify=True))
+        self.assertEqual(manifest.reasons["index.html"], ["options changed from {'minify': False, 'assets': None, 'images': None, 'eager_images': None} to {'minify': True, 'assets': None, 'images': None, 'eager_images': None}"])
+
+
+    def test_explain(self):
+        self.build()
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nChanged")
+        args = ("/", self.static, self.content, self.template, self.dest, self.manifest)
+        lines = explain(os.path.join(self.dest, "index.html"), *args)
+        self.assertEqual(lines[0], "index.html")
+        self.assertEqual(lines[2], "  last rebuilt because: new output")
+        self.assertTrue(lines[3].startswith("  next build: rebuilds it because ") and lines[3].endswith("index.md changed"))
+        # Asking about the template lists every page
+        lines = explain(self.template, *args)
+        self.assertTrue(lines[0].endswith("is an input of 2 output(s):"))
+        self.assertIn("blog/index.html", lines)
+        self.assertEqual(explain("missing.html", *args), [])
+
+
+    def test_explain_is_read_only(self):
+        self.build()
+        self.write(os.path.join(self.static, "cat.png"), "not really a png")
+        hashes = os.path.join(self.tmp.name, ".cache", "hashes.json")
+        images = os.path.join(self.tmp.name, ".cache", "images")
+        with mock.patch("main.HASHES", hashes), mock.patch("main.IMAGE_CACHE", images):
+            lines = explain("index.html", "/", self.static, self.content, self.template, self.dest, self.manifest, settings=BuildSettings(fingerprint=True, image_widths=(2,)))
+        self.assertTrue(lines[-1].startswith("  next build: rebuilds it because options changed"))
+        # Neither the hash cache nor the image cache is written
+        self.assertFalse(os.path.exists(hashes) or os.path.exists(images))
+
+
+if __name__ == "__main__":
+    unittest.main()
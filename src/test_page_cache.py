@@ -0,0 +1,61 @@
+import unittest
+import os, tempfile
+from page_cache import PageCache
+from main import generate_page
+from template import load_template
+
+
+class TestPageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = PageCache(os.path.join(self.tmp.name, "cache"))
+
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+
+    def test_key(self):
+        key = self.cache.key("# Hi", "abc", "/")
+        self.assertEqual(key, self.cache.key("# Hi", "abc", "/"))
+        self.assertNotEqual(key, self.cache.key("# Hi!", "abc", "/"))
+        self.assertNotEqual(key, self.cache.key("# Hi", "abd", "/"))
+        self.assertNotEqual(key, self.cache.key("# Hi", "abc", "/site/"))
+
+
+    def test_generate_page_uses_cache(self):
+        template = self.write("template.html", "{{ Content }}")
+        source = self.write("page.md", "# Hi")
+        dest = os.path.join(self.tmp.name, "page.html")
+        generate_page(source, template, dest, "/", self.cache)
+        # Fakes a different cached result to prove the second build copies it instead of rendering
+        key = self.cache.key("# Hi", load_template(template).digest, "/")
+        with open(self.cache.path(key), "w") as f:
+            f.write("from cache")
+        generate_page(source, template, dest, "/", self.cache)
+        with open(dest) as f:
+            self.assertEqual(f.read(), "from cache")
+
+
+    def test_evict_least_recently_used(self):
+        page = self.write("page.html", "x" * 100)
+        for i, key in enumerate(["aa1", "bb2", "cc3"]):
+            self.cache.put(key, page)
+            os.utime(self.cache.path(key), ns=(i * 10**9, i * 10**9))
+        # Reading the oldest entry makes it the most recently used
+        self.assertTrue(self.cache.get("aa1", os.path.join(self.tmp.name, "out.html")))
+        self.cache.max_bytes = 200
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertFalse(os.path.exists(self.cache.path("bb2")))
+        self.assertTrue(os.path.exists(self.cache.path("aa1")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import math, os, random, re, timeit
+import patterns
+import split_block as sb
+
+
+def raw_block_to_block_type(block):
+    '''
+    The classifier as it was before the patterns module, passing pattern strings to re on every call
+    '''
+    if len(re.findall("^#{1,6} .*", block)) > 0:
+        return sb.BlockType.HEADING
+    elif len(re.findall("^`{3}[^`]*`{3}$", block)) > 0:
+        return sb.BlockType.CODE
+    lines = block.split("\n")
+    if math.prod([re.search("^>", i) != None for i in lines]):
+        return sb.BlockType.QUOTE
+    elif math.prod([re.search("^- ", i) != None for i in lines]):
+        return sb.BlockType.UNORDERED_LIST
+    elif math.prod([re.match("^[0-9]*. ", i) != None for i in lines]):
+        return sb.BlockType.ORDERED_LIST
+    return sb.BlockType.PARAGRAPH
+
+
+BLOCKS = [
+    "## A heading",
+    "```\ncode\n```",
+    "> a\n> quote",
+    "- an\n- unordered\n- list",
+    "1. an\n2. ordered\n3. list",
+    "A paragraph of text\nspread over\nthree lines",
+]
+
+
+class TestPatterns(unittest.TestCase):
+    def test_same_block_types(self):
+        for block in BLOCKS:
+            self.assertEqual(sb.block_to_block_type(block), raw_block_to_block_type(block))
+
+
+    def test_same_block_types_fuzzed(self):
+        # Lines made from the characters the block patterns care about, so near misses come up often
+        rng = random.Random(0)
+        starts = ["#", "######", "#######", "```", "`", ">", "- ", "-", "1. ", "12 ", "1)", "9", " ", "a", ""]
+        for _ in range(5000):
+            lines = ["".join(rng.choices(starts, k=rng.randint(1, 3))) + rng.choice(["", " x", "`", "```"]) for _ in range(rng.randint(1, 4))]
+            block = "\n".join(lines).strip()
+            if block:
+                self.assertEqual(sb.block_to_block_type(block), raw_block_to_block_type(block), repr(block))
+
+
+    def test_scan_blocks(self):
+        markdown = "\n\n# Title\n\n\n\n- a\n- b\n\n   \n\n  text\nmore  \n\n\n> quote"
+        blocks = [i.strip() for i in markdown.split("\n\n") if i.strip()]
+        self.assertEqual(sb.markdown_to_blocks(markdown), blocks)
+        self.assertEqual(sb.scan_blocks(markdown), [(i, raw_block_to_block_type(i)) for i in blocks])
+
+
+    def test_delimiter_patterns_cached(self):
+        span, marker = patterns.delimiter_patterns(r"\*\*")
+        self.assertIs(patterns.delimiter_patterns(r"\*\*")[0], span)
+        self.assertEqual(span.findall("a **b** c"), ["**b**"])
+        self.assertEqual(marker.sub("", "**b**"), "b")
+
+
+@unittest.skipUnless(os.environ.get("SSG_BENCH"), "set SSG_BENCH=1 to run benchmarks")
+class BenchPatterns(unittest.TestCase):
+    def test_block_cost(self):
+        number = 20000
+        before = timeit.timeit(lambda: [raw_block_to_block_type(b) for b in BLOCKS], number=number)
+        after = timeit.timeit(lambda: [sb.block_to_block_type(b) for b in BLOCKS], number=number)
+        per_block = number * len(BLOCKS)
+        print(f"\nblock_to_block_type per block: before {before / per_block * 1e6:.2f}us, after {after / per_block * 1e6:.2f}us")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import time
+import profiler
+import split_block as sb
+
+
+class TestProfiler(unittest.TestCase):
+    def tearDown(self):
+        profiler.active = None
+
+
+    def test_inactive(self):
+        # Stages are no-ops unless a profiler is active
+        with profiler.stage("anything"), profiler.page("page.md"):
+            pass
+        self.assertIsNone(profiler.active)
+
+
+    def test_exclusive_stages(self):
+        profiler.active = profiler.Profiler()
+        with profiler.page("page.md") as record:
+            with profiler.stage("outer"):
+                with profiler.stage("inner"):
+                    time.sleep(0.02)
+        self.assertGreaterEqual(record["inner"], 0.02)
+        self.assertLess(record["outer"], 0.02)
+        self.assertGreaterEqual(record["total"], 0.02)
+        with profiler.stage("discovery"):
+            pass
+        report = profiler.active.report(top=1)
+        self.assertEqual(report["slowest_pages"][0]["path"], "page.md")
+        self.assertIn("discovery", report["build_stages"])
+
+
+    def test_markdown_stages(self):
+        sb.clear_block_cache()
+        profiler.active = profiler.Profiler()
+        with profiler.page("page.md") as record:
+            sb.markdown_to_html_node("# Title\n\nSome **text**")
+        self.assertEqual(sorted(i for i in record if i != "total"), ["block splitting", "html serialization", "inline parsing"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,9 @@
 import unittest
 from unittest import TestCase
-from main import extract_title, generate_page
-import os
+from main import extract_title, generate_page, render_pages, BuildError
+import os, tempfile
 from config import PROJECT, PUBLIC, STATIC
+from options import BuildSettings
 
 
 class Tests(TestCase):
@@ -49,5 +50,45 @@ This is a title
 
 
 
+class TestRenderPages(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.template = os.path.join(self.tmp.name, "template.html")
+        with open(self.template, "w") as f:
+            f.write("{{ Title }}|{{ Content }}")
+        self.pages = []
+        for i in range(6):
+            src = os.path.join(self.tmp.name, f"page{i}.md")
+            with open(src, "w") as f:
+                # Every third page has no title, so it should fail
+                f.write(f"# Page {i}\n\nBody {i}" if i % 3 else f"Body {i}")
+            self.pages.append((src, os.path.join(self.tmp.name, f"page{i}.html")))
+
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+    def test_parallel_matches_serial(self):
+        for jobs in (1, 3):
+            with self.assertRaises(BuildError) as caught:
+                render_pages(self.pages, self.template, "/", settings=BuildSettings(jobs=jobs))
+            # Every failure is reported, in page order, after the other pages were built
+            self.assertEqual([path for path, _ in caught.exception.failures], [self.pages[0][0], self.pages[3][0]])
+            with open(self.pages[4][1]) as f:
+                self.assertEqual(f.read(), "Page 4|<div><h1>Page 4</h1><p>Body 4</p></div>")
+
+
+    def test_async_pipeline_matches_serial(self):
+        for jobs in (1, 3):
+            for inflight in (1, 4):
+                with self.assertRaises(BuildError) as caught:
+                    render_pages(self.pages, self.template, "/", settings=BuildSettings(jobs=jobs, inflight=inflight))
+                self.assertEqual([path for path, _ in caught.exception.failures], [self.pages[0][0], self.pages[3][0]])
+                with open(self.pages[5][1]) as f:
+                    self.assertEqual(f.read(), "Page 5|<div><h1>Page 5</h1><p>Body 5</p></div>")
+                os.remove(self.pages[5][1])
+
+
 if __name__ == "__main__":
     unittest.main()
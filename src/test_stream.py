@@ -0,0 +1,146 @@
+import unittest
+import io, os, tempfile
+from unittest import mock
+from stream import MarkdownStream, MappedMarkdown, split_chunks, find_title, open_markdown, stream_page
+from template import Template
+from page_cache import PageCache
+from main import generate_page, extract_title
+import split_block
+
+MARKDOWN = "\n\n  Intro text\n\n# The Title  \n\n\n\n- a\n- [b](/b)\n\n```\ncode\n```\n\n\n> quote\n\n   \n\n1. one\n2. two\n"
+
+
+class TestStream(unittest.TestCase):
+    def test_blocks_match_split_at_any_chunk_size(self):
+        expected = split_block.scan_blocks(MARKDOWN)
+        for chunk_size in range(1, len(MARKDOWN) + 2):
+            blocks = list(MarkdownStream(io.StringIO(MARKDOWN), chunk_size).blocks())
+            self.assertEqual(blocks, expected, chunk_size)
+
+
+    def test_raw_blocks_match_split(self):
+        for text in ["", "\n", "a\n\n\nb", "a\n\n\n\n", "\n\n\n", "a\nb\n"]:
+            for chunk_size in (1, 2, 3, 100):
+                self.assertEqual(list(MarkdownStream(io.StringIO(text), chunk_size).raw_blocks()), text.split("\n\n"))
+                chunks = [text.encode()[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+                self.assertEqual(list(split_chunks(chunks, b"\n")), text.encode().split(b"\n\n"))
+
+
+    def test_find_title(self):
+        self.assertEqual(find_title("# A\ntext"), "A")
+        self.assertEqual(find_title("text\n# B  \n# C"), "B  ")
+        self.assertEqual(find_title("#No\n ## no\ntext"), None)
+        self.assertEqual(find_title(MARKDOWN), extract_title(MARKDOWN))
+
+
+    def test_stream_page_matches_render(self):
+        template = Template('<title>{{ Title }}</title><a href="/x">{{ Content }}</a>{{ Other }}', "/site/")
+        expected = template.render(Title=extract_title(MARKDOWN), Content=split_block.markdown_to_html_node(MARKDOWN, "/site/"))
+        for chunk_size in (1, 7, 4096):
+            output = io.StringIO()
+            title = stream_page(MarkdownStream(io.StringIO(MARKDOWN), chunk_size), template, output, "/site/")
+            self.assertEqual(title, "The Title  ")
+            self.assertEqual(output.getvalue(), expected)
+
+
+    def test_stream_skips_block_cache(self):
+        split_block.clear_block_cache()
+        html = "".join(MarkdownStream(io.StringIO(MARKDOWN), 7).iter_html("/site/"))
+        # Nothing from a streamed page is kept once it's written
+        self.assertEqual(split_block.block_cache_info().currsize, 0)
+        self.assertEqual(html, split_block.markdown_to_html_node(MARKDOWN, "/site/").to_html())
+
+
+    def test_stream_page_needs_title(self):
+        with self.assertRaises(Exception):
+            stream_page(MarkdownStream(io.StringIO("no title\n\nhere")), Template("{{ Title }}{{ Content }}"), io.StringIO())
+
+
+    def test_generate_page_streams_big_pages(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "page.md")
+            template = os.path.join(tmp, "template.html")
+            with open(source, "w") as f:
+                f.write(MARKDOWN)
+            with open(template, "w") as f:
+                f.write("<title>{{ Title }}</title>{{ Content }}")
+            generate_page(source, template, os.path.join(tmp, "whole.html"), "/")
+            cache = PageCache(os.path.join(tmp, "cache"))
+            with mock.patch("main.STREAM_THRESHOLD", 0), mock.patch("main.stream_page", wraps=stream_page) as streamed:
+                generate_page(source, template, os.path.join(tmp, "streamed.html"), "/", cache)
+                self.assertEqual(streamed.call_count, 1)
+            with open(os.path.join(tmp, "whole.html")) as whole, open(os.path.join(tmp, "streamed.html")) as streamed:
+                self.assertEqual(streamed.read(), whole.read())
+            # The chunked hash keys the page the same way as the whole file would
+            key = cache.key(MARKDOWN, Template("<title>{{ Title }}</title>{{ Content }}").digest, "/")
+            self.assertTrue(os.path.exists(cache.path(key)))
+            with open(source) as f:
+                self.assertEqual(MarkdownStream(f, 5).digest(), MarkdownStream(f).digest())
+
+
+class TestMappedMarkdown(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+    def write(self, text, newline=None):
+        path = os.path.join(self.tmp.name, "page.md")
+        with open(path, "w", newline=newline) as f:
+            f.write(text)
+        return path
+
+
+    def test_mapped_matches_streamed(self):
+        path = self.write(MARKDOWN + "\n\nUnicode: caf\u00e9 \u2014 \U0001f600")
+        with open(path) as f:
+            streamed = MarkdownStream(f)
+            expected = (list(streamed.blocks()), streamed.title, streamed.digest())
+        with open_markdown(path, mapped=True) as mapped:
+            self.assertIsInstance(mapped, MappedMarkdown)
+            self.assertEqual(mapped.title, "The Title  ")
+            self.assertEqual((list(mapped.blocks()), mapped.title, mapped.digest()), expected)
+
+
+    def test_mapped_window_boundaries(self):
+        path = self.write(MARKDOWN)
+        for window in (1, 2, 5):
+            with mock.patch("stream.WINDOW_SIZE", window), open_markdown(path, mapped=True) as mapped:
+                self.assertEqual(list(mapped.blocks()), split_block.scan_blocks(MARKDOWN))
+
+
+    def test_title_on_first_line_or_missing(self):
+        with open_markdown(self.write("# Top\ntext"), mapped=True) as mapped:
+            self.assertEqual(mapped.title, "Top")
+        with open_markdown(self.write("text\n\n#no"), mapped=True) as mapped:
+            self.assertIsNone(mapped.title)
+
+
+    def test_falls_back_to_text(self):
+        # Carriage returns and empty files can't be handled by byte offsets
+        with open_markdown(self.write("# A\r\n\r\ntext", newline=""), mapped=True) as markdown:
+            self.assertNotIsInstance(markdown, MappedMarkdown)
+            self.assertEqual([i for i, _ in markdown.blocks()], ["# A", "text"])
+        with open_markdown(self.write(""), mapped=True) as markdown:
+            self.assertNotIsInstance(markdown, MappedMarkdown)
+
+
+    def test_generate_page_mapped(self):
+        source = self.write(MARKDOWN)
+        template = os.path.join(self.tmp.name, "template.html")
+        with open(template, "w") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+        whole = os.path.join(self.tmp.name, "whole.html")
+        mapped = os.path.join(self.tmp.name, "mapped.html")
+        generate_page(source, template, whole, "/")
+        with mock.patch("main.STREAM_THRESHOLD", 0):
+            generate_page(source, template, mapped, "/", mapped=True)
+        with open(whole) as a, open(mapped) as b:
+            self.assertEqual(b.read(), a.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
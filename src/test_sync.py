@@ -0,0 +1,102 @@
+import unittest
+import os, tempfile
+from sync import sync_file, is_synced, remove_stale, AssetCopier
+from main import build_synced
+
+
+class TestSync(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "a.png")
+        self.dest = os.path.join(self.tmp.name, "docs", "images", "a.png")
+        with open(self.src, "wb") as f:
+            f.write(b"png data")
+
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+    def test_skips_unchanged(self):
+        self.assertTrue(sync_file(self.src, self.dest))
+        self.assertFalse(sync_file(self.src, self.dest))
+        with open(self.src, "wb") as f:
+            f.write(b"new png data")
+        self.assertTrue(sync_file(self.src, self.dest))
+        with open(self.dest, "rb") as f:
+            self.assertEqual(f.read(), b"new png data")
+
+
+    def test_link_modes(self):
+        sync_file(self.src, self.dest, link="hardlink")
+        self.assertTrue(os.path.samefile(self.src, self.dest))
+        os.remove(self.dest)
+        # Falls back to a plain copy where the filesystem can't clone files
+        sync_file(self.src, self.dest, link="reflink")
+        self.assertTrue(is_synced(self.src, self.dest))
+
+
+    def test_checksum(self):
+        sync_file(self.src, self.dest)
+        os.utime(self.dest, ns=(0, 0))
+        self.assertFalse(is_synced(self.src, self.dest))
+        self.assertTrue(is_synced(self.src, self.dest, checksum=True))
+        # The matching mtime is copied across, so the cheap check passes from now on
+        self.assertTrue(is_synced(self.src, self.dest))
+
+
+    def test_remove_stale(self):
+        docs = os.path.join(self.tmp.name, "docs")
+        for path in ("index.html", os.path.join("old", "deep", "stale.png"), os.path.join("images", "b.png")):
+            sync_file(self.src, os.path.join(docs, path))
+        sync_file(self.src, self.dest)
+        self.assertEqual(remove_stale(docs, {"index.html", os.path.join("images", "a.png")}), 2)
+        # Folders emptied along the way go too, along with their emptied parents
+        self.assertEqual(sorted(os.listdir(docs)), ["images", "index.html"])
+        self.assertEqual(os.listdir(os.path.join(docs, "images")), ["a.png"])
+
+
+    def test_build_synced_removes_stale(self):
+        root = self.tmp.name
+        static, content, docs = (os.path.join(root, i) for i in ("static", "content", "docs"))
+        os.makedirs(static)
+        os.makedirs(os.path.join(content, "old"))
+        template = os.path.join(root, "template.html")
+        for path, text in ((template, "{{ Content }}"), (os.path.join(static, "index.css"), "body {}"), (os.path.join(content, "index.md"), "# Home")):
+            with open(path, "w") as f:
+                f.write(text)
+        sync_file(self.src, os.path.join(docs, "old", "stale.png"))
+        build_synced("/", static, content, template, docs)
+        self.assertEqual(sorted(os.listdir(docs)), ["index.css", "index.html"])
+
+
+    def test_build_synced_missing_dest(self):
+        root = self.tmp.name
+        static, content, docs = (os.path.join(root, i) for i in ("static", "content", "docs"))
+        os.makedirs(static)
+        os.makedirs(content)
+        template = os.path.join(root, "template.html")
+        for path, text in ((template, "{{ Content }}"), (os.path.join(content, "index.md"), "# Home")):
+            with open(path, "w") as f:
+                f.write(text)
+        # The first synced build starts without a docs folder
+        build_synced("/", static, content, template, docs)
+        self.assertEqual(os.listdir(docs), ["index.html"])
+
+
+    def test_asset_copier(self):
+        for jobs in (1, 3):
+            copier = AssetCopier(jobs)
+            missing = os.path.join(self.tmp.name, "missing.png")
+            dests = [os.path.join(self.tmp.name, f"out{jobs}", f"{i}.png") for i in range(5)]
+            for dest in dests:
+                copier.submit(sync_file, self.src, dest)
+            copier.submit(sync_file, missing, dests[0] + ".2")
+            # Every copy finishes before wait returns, and failures are reported rather than raised
+            failures = copier.wait()
+            self.assertEqual([path for path, _ in failures], [missing])
+            self.assertTrue(all(os.path.exists(i) for i in dests))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import io, os, tempfile
+from template import Template, load_template, minify_html
+from htmlnode import ParentNode, LeafNode
+
+
+class TestTemplate(unittest.TestCase):
+    def test_render(self):
+        template = Template('<title>{{ Title }}</title><link href="/index.css" />{{ Content }}{{ Other }}', "/site/")
+        self.assertEqual(template.slots, ["Title", "Content", "Other"])
+        node = ParentNode("div", [LeafNode("a", "home", {"href": "/"})])
+        # Only the template's own paths are rewritten, and unknown slots are left alone
+        self.assertEqual(
+            template.render(Title="Hi", Content=node),
+            '<title>Hi</title><link href="/site/index.css" /><div><a href="/">home</a></div>{{ Other }}'
+        )
+
+
+    def test_backslashes_are_literal(self):
+        # re.sub used to treat these as group references
+        template = Template("{{ Title }}|{{ Content }}")
+        out = io.StringIO()
+        template.write(out, Title=r"C:\new \1", Content=LeafNode(None, r"\g<0>"))
+        self.assertEqual(out.getvalue(), r"C:\new \1|\g<0>")
+
+
+    def test_includes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "partials"))
+            for name, text in [("template.html", "{{ include partials/head.html }}{{ Content }}"), ("partials/head.html", '<link href="/a.css" />{{ include nav.html }}'), ("partials/nav.html", "<nav>{{ Title }}</nav>")]:
+                with open(os.path.join(tmp, name), "w") as f:
+                    f.write(text)
+            path = os.path.join(tmp, "template.html")
+            template = load_template(path, "/site/")
+            self.assertEqual(template.render(Title="Hi", Content="x"), '<link href="/site/a.css" /><nav>Hi</nav>x')
+            self.assertEqual(sorted(template.includes), [os.path.join(tmp, "partials", "head.html"), os.path.join(tmp, "partials", "nav.html")])
+            # Editing a partial is picked up even though the template itself didn't change
+            with open(os.path.join(tmp, "partials", "nav.html"), "w") as f:
+                f.write("<nav>{{ Title }}!</nav>")
+            self.assertEqual(load_template(path, "/site/").render(Title="Hi", Content="x"), '<link href="/site/a.css" /><nav>Hi!</nav>x')
+
+
+    def test_include_cycle(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "template.html")
+            with open(path, "w") as f:
+                f.write("{{ include template.html }}")
+            with self.assertRaises(ValueError):
+                load_template(path)
+
+
+    def test_minify_html(self):
+        text = "<html>\n  <body>\n    <p>one   two</p>\n    <pre>keep\n    this</pre>\n  </body>\n</html>\n"
+        self.assertEqual(minify_html(text), "<html><body><p>one two</p><pre>keep\n    this</pre></body></html>")
+        template = Template('<head>\n  <link href="/a.css" />\n</head>\n<body>{{ Content }}</body>', "/site/", minify=True)
+        self.assertEqual(template.render(Content="x"), '<head><link href="/site/a.css" /></head><body>x</body>')
+        # Node values are minified to match the template, whether rendered or written out
+        node = ParentNode("p", [LeafNode("a", "link", {"href": "/x"})])
+        self.assertEqual(template.render(Content=node), '<head><link href="/site/a.css" /></head><body><p><a href=/x>link</a></p></body>')
+        out = io.StringIO()
+        template.write(out, Content=node)
+        self.assertEqual(out.getvalue(), template.render(Content=node))
+
+
+if __name__ == "__main__":
+    unittest.main()
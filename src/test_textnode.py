@@ -25,6 +25,11 @@ class TestTextNode(unittest.TestCase):
         node2 = TextNode("This is a text node", TextType.BOLD)
         self.assertNotEqual(node, node2)
 
+    def test_slots(self):
+        node = TextNode("This is a text node", TextType.BOLD)
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertEqual(repr(node), "TextNode(This is a text node, bold, None)")
+
     def test_text_node_to_html_node(self):
         node = TextNode("This is a text node", TextType.BOLD, url="https://www.google.com")
         html_version = text_node_to_html_node(node)
@@ -193,6 +198,42 @@ class TestTextNode(unittest.TestCase):
         ]
         self.assertEqual(test, should_be)
 
+    def test_text_to_nodes_single_pass(self):
+        test_func = splitter_funcs.text_to_text_nodes
+        # Text that happens to contain the old split sentinel is left alone
+        self.assertEqual(test_func("a |;& b **c**"), [TextNode("a |;& b ", TextType.TEXT), TextNode("c", TextType.BOLD)])
+        # Delimiters inside link urls don't start emphasis
+        self.assertEqual(
+            test_func("[snake_case](/a_b_c) and _this_"),
+            [
+                TextNode("snake_case", TextType.LINK, "/a_b_c"),
+                TextNode(" and ", TextType.TEXT),
+                TextNode("this", TextType.ITALIC),
+            ]
+        )
+        self.assertEqual(test_func("plain"), [TextNode("plain", TextType.TEXT)])
+        self.assertEqual(test_func(""), [TextNode("", TextType.TEXT)])
+
+    def test_text_to_nodes_link_precedence(self):
+        test_func = splitter_funcs.text_to_text_nodes
+        # Links win over emphasis anywhere in the line, not just where both start at the same place
+        self.assertEqual(
+            test_func("Set my_var, then read [the guide](/setup_guide)."),
+            [
+                TextNode("Set my_var, then read ", TextType.TEXT),
+                TextNode("the guide", TextType.LINK, "/setup_guide"),
+                TextNode(".", TextType.TEXT),
+            ]
+        )
+        self.assertEqual(
+            test_func("**bold [link](/u)**"),
+            [
+                TextNode("**bold ", TextType.TEXT),
+                TextNode("link", TextType.LINK, "/u"),
+                TextNode("**", TextType.TEXT),
+            ]
+        )
+
     def test_markdown_to_blocks(self):
         test_func = sb.markdown_to_blocks
         md = """
@@ -335,6 +376,18 @@ This is another paragraph with _italic_ text and `code` here
             "<div><p>This is <b>bolded</b> paragraph text in a p tag here</p><p>This is another paragraph with <i>italic</i> text and <code>code</code> here</p></div>",
         )
 
+    def test_block_cache(self):
+        sb.clear_block_cache()
+        md = "Shared **notice**\n\nPage one"
+        first = sb.markdown_to_html_node(md).to_html()
+        second = sb.markdown_to_html_node("Shared **notice**\n\nPage two").to_html()
+        self.assertEqual(first, "<div><p>Shared <b>notice</b></p><p>Page one</p></div>")
+        self.assertEqual(second, "<div><p>Shared <b>notice</b></p><p>Page two</p></div>")
+        info = sb.block_cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 3))
+        # The same block under another basepath renders separately
+        self.assertEqual(sb.markdown_to_html_node("[a](/b)", "/site/").to_html(), '<div><p><a href="/site/b">a</a></p></div>')
+
 
 if __name__ == "__main__":
     unittest.main()
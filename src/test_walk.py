@@ -0,0 +1,42 @@
+import unittest
+import os, sys, tempfile
+from walk import walk_files, walk_dirs
+from main import rm_r, copy_contents
+
+
+class TestWalk(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "src")
+        os.makedirs(os.path.join(self.src, "a", "b"))
+        for path in ("z.txt", "a/y.txt", "a/b/x.md"):
+            with open(os.path.join(self.src, path), "w") as f:
+                f.write("# Title\n\nText")
+
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+    def test_walk_files(self):
+        self.assertEqual([i for i, _ in walk_files(self.src)], ["z.txt", "a/y.txt", "a/b/x.md"])
+        self.assertEqual([i for _, i in walk_dirs(self.src)], ["a", "a/b"])
+
+
+    def test_wide_folder(self):
+        # More entries than the recursion limit, which the old recursive walkers couldn't handle
+        wide = os.path.join(self.src, "wide")
+        os.mkdir(wide)
+        count = sys.getrecursionlimit() + 500
+        for i in range(count):
+            open(os.path.join(wide, f"{i}.md"), "w").close()
+
+        dest = os.path.join(self.tmp.name, "dest")
+        copy_contents(self.src, dest)
+        self.assertEqual(len(os.listdir(os.path.join(dest, "wide"))), count)
+        rm_r(dest)
+        self.assertFalse(os.path.exists(dest))
+
+
+if __name__ == "__main__":
+    unittest.main()
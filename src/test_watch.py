@@ -0,0 +1,57 @@
+import unittest
+import io, os, tempfile, threading, urllib.request
+from contextlib import redirect_stdout
+from unittest import mock
+from watch import LiveReload, snapshot, serve, watch
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.tmp.name, "index.html"), "w") as f:
+            f.write("<body>hi</body>")
+
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+    def test_snapshot_sees_changes(self):
+        before = snapshot([self.tmp.name], [])
+        with open(os.path.join(self.tmp.name, "new.md"), "w") as f:
+            f.write("# New")
+        self.assertNotEqual(snapshot([self.tmp.name], []), before)
+
+
+    def test_live_reload(self):
+        live_reload = LiveReload()
+        self.assertEqual(live_reload.wait(-1), 0)
+        threading.Timer(0.05, live_reload.bump).start()
+        self.assertEqual(live_reload.wait(0, timeout=5), 1)
+
+
+    def test_pages_get_reload_script(self):
+        live_reload = LiveReload()
+        server = serve(self.tmp.name, 0, live_reload)
+        try:
+            url = f"http://localhost:{server.server_address[1]}"
+            page = urllib.request.urlopen(url + "/").read().decode()
+            self.assertTrue(page.startswith("<body>hi<script>"))
+            self.assertEqual(urllib.request.urlopen(url + "/__livereload?since=-1").read(), b"0")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+    def test_failed_first_build_keeps_watching(self):
+        def rebuild():
+            raise ValueError("broken page")
+        # Stops the loop on its first poll, as Ctrl+C would
+        with mock.patch("watch.time.sleep", side_effect=KeyboardInterrupt), redirect_stdout(io.StringIO()) as out:
+            watch(rebuild, [self.tmp.name], [], self.tmp.name, 0)
+        self.assertIn("broken page", out.getvalue())
+        self.assertIn("Serving", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
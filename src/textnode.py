@@ -10,6 +10,9 @@ class TextType(Enum):
 
 
 class TextNode:
+    # Slots keep pages with hundreds of thousands of nodes small (no per-instance __dict__)
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url=None):
         self.text = text
         self.text_type = text_type
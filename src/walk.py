@@ -0,0 +1,71 @@
+import os
+
+
+def walk_files(root: str):
+    '''
+    Iterates over every file below a folder without recursion, so deep or very wide trees are handled in linear time
+
+    Inputs:
+        root: A path-string to the folder to walk
+
+    Outputs:
+        Yields (relative path-string, os.DirEntry) tuples for every file, with each folder's files (in name order)
+        coming before its subfolders
+    '''
+    # A stack of (folder path, folder path relative to the root) still to be scanned
+    stack = [(root, "")]
+    while stack:
+        folder, rel_folder = stack.pop()
+        with os.scandir(folder) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        subfolders = []
+        for entry in entries:
+            rel_path = os.path.join(rel_folder, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                subfolders.append((entry.path, rel_path))
+            else:
+                yield rel_path, entry
+        # Pushed in reverse so folders come off the stack in name order
+        stack.extend(reversed(subfolders))
+
+
+def walk_dirs(root: str) -> list:
+    '''
+    Lists every folder below a folder (not including it), parents before children
+
+    Inputs:
+        root: A path-string to the folder to walk
+
+    Outputs:
+        A list of (path-string, relative path-string) tuples
+    '''
+    out = []
+    stack = [(root, "")]
+    while stack:
+        folder, rel_folder = stack.pop()
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    rel_path = os.path.join(rel_folder, entry.name)
+                    out.append((entry.path, rel_path))
+                    stack.append((entry.path, rel_path))
+    return out
+
+
+def remove_tree(folder: str) -> None:
+    '''
+    Deletes a folder and everything in it without recursion
+
+    Inputs:
+        folder: A path-string to the folder to delete
+    '''
+    dirs = walk_dirs(folder)
+    # Files are removed folder by folder, then the emptied folders deepest first
+    for path, _ in [(folder, "")] + dirs:
+        with os.scandir(path) as it:
+            for entry in it:
+                if not entry.is_dir(follow_symlinks=False):
+                    os.remove(entry.path)
+    for path, _ in reversed(dirs):
+        os.rmdir(path)
+    os.rmdir(folder)
@@ -0,0 +1,182 @@
+'''
+Watch mode: keeps one process (and its parsed template and caches) running, rebuilds whatever changed in the
+content folder, the static folder or the template, and serves the docs folder with a live-reload hook
+'''
+import os, threading, time
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from walk import walk_files
+
+# Injected into every served page: long-polls the server and reloads the page when a rebuild finishes
+RELOAD_SCRIPT = b'''<script>
+(function () {
+    var version = -1;
+    function poll() {
+        fetch("/__livereload?since=" + version).then(function (r) { return r.text(); }).then(function (text) {
+            var latest = parseInt(text, 10);
+            if (version !== -1 && latest !== version) { location.reload(); return; }
+            version = latest;
+            poll();
+        }).catch(function () { setTimeout(poll, 1000); });
+    }
+    poll();
+})();
+</script>'''
+
+
+class LiveReload:
+    '''
+    A build counter that page requests can wait on
+    '''
+    def __init__(self):
+        self.version = 0
+        self.condition = threading.Condition()
+
+
+    def bump(self) -> None:
+        '''
+        Records a finished rebuild and wakes every waiting page
+        '''
+        with self.condition:
+            self.version += 1
+            self.condition.notify_all()
+
+
+    def wait(self, since: int, timeout=30) -> int:
+        '''
+        Blocks until the build counter moves past a version (or the timeout passes)
+
+        Inputs:
+            since: The version the page was loaded at (-1 to return straight away)
+            timeout: The longest to wait, in seconds
+
+        Outputs:
+            The current version
+        '''
+        with self.condition:
+            if since != -1:
+                self.condition.wait_for(lambda: self.version != since, timeout)
+            return self.version
+
+
+class ReloadingHandler(SimpleHTTPRequestHandler):
+    '''
+    Serves the docs folder, adding the live-reload script to html pages and answering its polls
+    '''
+    def __init__(self, *args, live_reload=None, **kwargs):
+        self.live_reload = live_reload
+        super().__init__(*args, **kwargs)
+
+
+    def do_GET(self):
+        if self.path.startswith("/__livereload"):
+            since = self.path.partition("since=")[2]
+            version = self.live_reload.wait(int(since) if since.lstrip("-").isdigit() else -1)
+            self.send_bytes(str(version).encode(), "text/plain")
+            return
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            path = os.path.join(path, "index.html")
+        if not path.endswith(".html") or not os.path.isfile(path):
+            super().do_GET()
+            return
+        with open(path, "rb") as f:
+            page = f.read()
+        # Puts the script just before </body>, or at the end if the page doesn't have one
+        at = page.rfind(b"</body>")
+        page = page[:at] + RELOAD_SCRIPT + page[at:] if at != -1 else page + RELOAD_SCRIPT
+        self.send_bytes(page, "text/html; charset=utf-8")
+
+
+    def send_bytes(self, body: bytes, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, format, *args):
+        # Keeps the terminal for build output
+        pass
+
+
+def snapshot(folders: list, files: list) -> dict:
+    '''
+    Records the mtime and size of every file being watched
+
+    Inputs:
+        folders: A list of path-strings to folders to watch
+        files: A list of path-strings to single files to watch
+
+    Outputs:
+        A dict mapping path-strings to (mtime_ns, size) tuples
+    '''
+    out = {}
+    for folder in folders:
+        for _, entry in walk_files(folder):
+            stat = entry.stat()
+            out[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    for path in files:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            out[path] = (stat.st_mtime_ns, stat.st_size)
+    return out
+
+
+def serve(folder: str, port: int, live_reload: LiveReload) -> ThreadingHTTPServer:
+    '''
+    Starts serving a folder in a background thread
+
+    Outputs:
+        The running server
+    '''
+    handler = partial(ReloadingHandler, directory=folder, live_reload=live_reload)
+    server = ThreadingHTTPServer(("", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def watch(rebuild, folders: list, files: list, serve_folder: str, port: int, interval=0.05) -> None:
+    '''
+    Builds, serves, then polls for changes and rebuilds until interrupted
+
+    Inputs:
+        rebuild: A function that brings the served folder up to date
+        folders: A list of path-strings to folders to watch
+        files: A list of path-strings to single files to watch
+        serve_folder: A path-string to the folder to serve
+        port: The port to serve on
+        interval: How long to wait between polls, in seconds
+    '''
+    live_reload = LiveReload()
+    try:
+        rebuild()
+    except Exception as e:
+        # Starts serving anyway, so a page that's broken at startup can be fixed like any other
+        print(e)
+    before = snapshot(folders, files)
+    server = serve(serve_folder, port, live_reload)
+    print(f"Serving {serve_folder} at http://localhost:{port}/ (watching for changes, Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(interval)
+            after = snapshot(folders, files)
+            if after == before:
+                continue
+            before = after
+            start = time.perf_counter()
+            try:
+                rebuild()
+            except Exception as e:
+                # Keeps watching so the next save can fix the problem
+                print(e)
+                continue
+            live_reload.bump()
+            print(f"Rebuilt in {(time.perf_counter() - start) * 1000:.0f} ms")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()